@@ -1,8 +1,23 @@
 import os
 import sys
+import json
+import time
+import zlib
+import asyncio
+import threading
 import configparser
+
+# Startup phases are timed from here, before the heavy imports below
+startup_started = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, Query, Request, Form, Depends
-from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse
+from fastapi.responses import (
+    JSONResponse,
+    HTMLResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
@@ -12,14 +27,45 @@ from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError
 from loguru import logger
 
-from selenium_crawler import SeleniumCrawler
-from html_cleaner import HtmlCleaner
+from log_setup import setup_logging
+
+# Log sinks are set up once here, before any worker thread starts logging
+setup_logging()
+
+from crawl_service import (
+    crawler,
+    crawl_executor,
+    crawl_flights,
+    crawl_scheduler,
+    crawled_since,
+    fetch_page_async,
+    http_executor,
+    work_executor,
+    process_and_save,
+    prewarm,
+    shutdown as shutdown_crawl_service,
+)
+from task_executor import ExecutorBusy
+from url_canonicalizer import canonicalize_url
+import crawl_jobs
+import reprocess
+from refresher import refresher
+from metrics import registry, API_REQUESTS
 from database import (
     init_db,
-    save_crawled_page,
-    get_crawled_page,
-    should_recrawl,
+    get_crawl_job,
+    lookup_page,
     get_session,
+    apply_search,
+    search_snippets,
+    parse_fields,
+    project_fields,
+    keyset_paginate,
+    offset_paginate,
+    iter_pages,
+    iter_pages_by_ids,
+    write_queue,
+    page_cache,
     CrawledPage,
 )
 
@@ -27,6 +73,19 @@ from database import (
 config = configparser.ConfigParser()
 config.read("config.ini")
 
+
+def log_startup_phase(phase, phase_started):
+    """Log how long a startup phase took, returning the time it ended"""
+    now = time.perf_counter()
+    logger.info(
+        f"Startup: {phase} took {now - phase_started:.3f}s "
+        f"({now - startup_started:.3f}s since start)"
+    )
+    return now
+
+
+phase_started = log_startup_phase("imports", startup_started)
+
 # Create app
 app = FastAPI(
     title="Dikontenin Helper",
@@ -101,14 +160,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Record request latency per route template, so ids in paths do not explode the labels"""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    API_REQUESTS.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=response.status_code,
+    )
+    return response
+
+
+# Current state read when /api/metrics is scraped
+registry.gauge(
+    "crawler_executor_pending",
+    "Tasks running or queued per executor",
+    lambda: {
+        "crawl": crawl_executor.stats()["pending"],
+        "http": http_executor.stats()["pending"],
+        "work": work_executor.stats()["pending"],
+    },
+    ["executor"],
+)
+registry.gauge(
+    "crawler_browsers_idle", "Pooled browsers waiting for work", lambda: crawler.stats()["idle"]
+)
+registry.gauge("crawler_db_write_queue", "Writes waiting for the writer thread", write_queue.depth)
+registry.gauge(
+    "crawler_crawls_in_flight", "Crawls currently running", lambda: crawl_flights.stats()["in_flight"]
+)
+registry.gauge(
+    "crawler_page_cache",
+    "Page cache counters",
+    lambda: {
+        key: value
+        for key, value in (page_cache.stats() if page_cache else {}).items()
+        if key in ("entries", "bytes", "hits", "misses", "evictions", "expirations")
+    },
+    ["value"],
+)
+
 # Mount static files directory
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
 # Initialize database
+phase_started = log_startup_phase("app setup", phase_started)
 init_db()
+phase_started = log_startup_phase("database init", phase_started)
 
-# Initialize crawler
-crawler = SeleniumCrawler()
+# Continue batch jobs interrupted by a restart
+crawl_jobs.resume_jobs()
+
+# Keep popular pages fresh in the background
+refresher.start()
+phase_started = log_startup_phase("background workers", phase_started)
 
 
 # Models
@@ -124,9 +234,24 @@ class CrawlResponse(BaseModel):
     description: str
     content: str
     success: bool
+    cached: bool = False
     message: Optional[str] = None
 
 
+class BatchCrawlRequest(BaseModel):
+    """Request model for batch crawl"""
+
+    urls: List[HttpUrl]
+
+
+class ReprocessRequest(BaseModel):
+    """Request model for reprocessing stored pages"""
+
+    url: Optional[str] = None
+    since: Optional[datetime] = None
+    ids: Optional[List[int]] = None
+
+
 class PageIdsRequest(BaseModel):
     """Request model for page IDs"""
 
@@ -136,13 +261,30 @@ class PageIdsRequest(BaseModel):
 # Status tracking
 is_server_running = True
 
+# Page size limits for /api/pages
+DEFAULT_PAGE_SIZE = config.getint("api", "page_size", fallback=50)
+MAX_PAGE_SIZE = config.getint("api", "max_page_size", fallback=500)
+
+
+def busy_response(error, url=None):
+    """Build a 429 response telling the client when to retry"""
+    content = {"success": False, "message": str(error)}
+    if url is not None:
+        content.update({"url": url, "title": "", "description": "", "content": ""})
+    return JSONResponse(
+        status_code=429,
+        content=content,
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
 
 # Web interface endpoints
 @app.get("/", response_class=HTMLResponse)
-async def home_page(
+def home_page(
     request: Request,
     url: str = None,
     title: str = None,
+    q: str = None,
     page: int = 1,
     per_page: int = 9,
 ):
@@ -157,23 +299,25 @@ async def home_page(
         if title:
             query = query.filter(CrawledPage.title.ilike(f"%{title}%"))
 
-        # Get total count for pagination
-        total_count = query.count()
+        # Full-text search orders by relevance, otherwise newest first; counting
+        # a search only needs its match filter, not ranking or snippets
+        if q:
+            total_count = apply_search(query, q, ranked=False).count()
+            query = apply_search(query, q)
+        else:
+            total_count = query.count()
+            query = query.order_by(CrawledPage.last_crawled_at.desc())
 
         # Calculate pagination values
         total_pages = (total_count + per_page - 1) // per_page  # Ceiling division
         offset = (page - 1) * per_page
 
         # Execute query with pagination
-        pages = (
-            query.order_by(CrawledPage.last_crawled_at.desc())
-            .offset(offset)
-            .limit(per_page)
-            .all()
-        )
+        rows = query.offset(offset).limit(per_page).all()
 
-        # Convert to dictionaries for template
-        page_dicts = [p.to_dict() for p in pages]
+        # Convert to dictionaries for template, with snippets for the shown rows only
+        snippets = search_snippets(q, [p.id for p in rows]) if q else {}
+        page_dicts = [{**p.to_dict(), "snippet": snippets.get(p.id)} for p in rows]
 
         # Render template with pagination data
         return templates.TemplateResponse(
@@ -183,6 +327,7 @@ async def home_page(
                 "pages": page_dicts,
                 "url": url,
                 "title": title,
+                "q": q,
                 "server_running": is_server_running,
                 "pagination": {
                     "page": page,
@@ -220,35 +365,28 @@ async def read_root():
 @app.post("/crawl")
 async def crawl_form_url(request: Request, url: str = Form(...)):
     """Crawl a URL submitted via the web form and return JSON response"""
-    session = get_session()
     try:
-        # Check if URL already exists in database and is still fresh
-        page = get_crawled_page(url)
+        # The API handler checks the cache and crawls only when the page is stale
+        url_request = UrlRequest(url=url)
+        result = await crawl_api_url(url_request)
 
-        if page and not should_recrawl(page.last_crawled_at):
-            # URL already crawled and data is still fresh
-            logger.info(
-                f"URL {url} already crawled and data is still fresh. Returning cached data."
-            )
+        # Pass through error and backpressure responses unchanged
+        if isinstance(result, JSONResponse):
+            return result
 
+        if result.get("cached"):
             # Return JSON with cached flag and data
             return {
                 "success": True,
                 "cached": True,
                 "message": f"URL {url} already crawled and data is still fresh.",
-                "url": page.url,
-                "title": page.title,
-                "description": page.description,
-                "content": page.content,
-                "last_crawled_at": page.last_crawled_at.isoformat()
-                if page.last_crawled_at
-                else None,
+                "url": result.get("url", url),
+                "title": result.get("title", ""),
+                "description": result.get("description", ""),
+                "content": result.get("content", ""),
+                "last_crawled_at": result.get("last_crawled_at"),
             }
 
-        # Create a URL request and pass to the API handler
-        url_request = UrlRequest(url=url)
-        result = await crawl_api_url(url_request)
-
         # Return JSON response with success flag
         return {
             "success": True,
@@ -263,52 +401,68 @@ async def crawl_form_url(request: Request, url: str = Form(...)):
         # Handle errors and return error message as JSON
         logger.error(f"Error crawling URL: {str(e)}")
         return {"success": False, "message": f"Error crawling URL: {str(e)}"}
-    finally:
-        session.close()
+
+
+async def crawl_and_process(url, requested_at):
+    """Crawl a URL and process and save the page, off the event loop"""
+    # A crawl of the same URL may have finished between the cache check and winning the flight
+    page = await work_executor.run(crawled_since, url, requested_at)
+    if page:
+        logger.info(f"URL {url} was crawled while this request waited, not crawling it again")
+        return page
+
+    logger.info(f"Crawling URL: {url}")
+    # Fetch off the event loop so other requests keep being served
+    crawled_data = await fetch_page_async(url)
+
+    if not crawled_data:
+        raise HTTPException(status_code=500, detail="Failed to crawl URL")
+
+    # Process the page and save to database
+    processed_data = await work_executor.run(process_and_save, crawled_data)
+
+    if not processed_data:
+        raise HTTPException(status_code=500, detail="Failed to process page content")
+    return processed_data
 
 
 @app.post("/api/crawl", response_model=CrawlResponse)
 async def crawl_api_url(request: UrlRequest):
     """Crawl a URL and return the processed content"""
     url = str(request.url)
+    requested_at = datetime.now()
 
     try:
-        # Check if URL is already crawled and still fresh
-        if not should_recrawl(url):
+        # Check if URL is already crawled and still fresh, in a single query
+        cached_data, stale = await work_executor.run(lookup_page, url)
+        if cached_data and not stale:
             logger.info(
                 f"URL {url} already crawled and data is still fresh. Returning cached data."
             )
-            cached_data = get_crawled_page(url)
-            if cached_data:
-                return {
-                    **cached_data,
-                    "success": True,
-                    "message": "Retrieved from cache",
-                }
-
-        # Crawl URL
-        logger.info(f"Crawling URL: {url}")
-        crawled_data = crawler.crawl_url(url)
-
-        if not crawled_data:
-            raise HTTPException(status_code=500, detail="Failed to crawl URL")
-
-        # Process the page
-        processed_data = HtmlCleaner.process_page(crawled_data)
-
-        if not processed_data:
-            raise HTTPException(
-                status_code=500, detail="Failed to process page content"
-            )
+            return {
+                **cached_data,
+                "success": True,
+                "cached": True,
+                "message": "Retrieved from cache",
+            }
 
-        # Save to database
-        save_crawled_page(
-            url=processed_data["url"],
-            title=processed_data["title"],
-            description=processed_data["description"],
-            content=processed_data["content"],
-            html=processed_data["html"],
-        )
+        # Join a crawl of the same URL that is already running instead of starting another
+        key = canonicalize_url(url)
+        flight, leader = crawl_flights.begin(key)
+        if leader:
+            try:
+                processed_data = await crawl_and_process(url, requested_at)
+            except BaseException as e:
+                # A cancelled request must still release the callers waiting on it
+                if not isinstance(e, Exception):
+                    e = RuntimeError(f"Crawl of {url} was cancelled")
+                crawl_flights.finish(key, error=e)
+                raise
+            crawl_flights.finish(key, result=processed_data)
+        else:
+            logger.info(f"Waiting for in-flight crawl of {url}")
+            # Shielded, so a follower that gives up does not cancel the shared flight
+            processed_data = await asyncio.shield(asyncio.wrap_future(flight))
 
         # Return response
         return {
@@ -320,6 +474,9 @@ async def crawl_api_url(request: UrlRequest):
             "message": "Successfully crawled and processed URL",
         }
 
+    except ExecutorBusy as e:
+        logger.warning(f"Rejected crawl of {url}: {str(e)}")
+        return busy_response(e, url=url)
     except Exception as e:
         logger.error(f"Error processing URL {url}: {str(e)}")
         return JSONResponse(
@@ -335,6 +492,90 @@ async def crawl_api_url(request: UrlRequest):
         )
 
 
+@app.post("/api/crawl/batch")
+def crawl_batch(request: BatchCrawlRequest):
+    """Queue many URLs for crawling and return a job id right away"""
+    # Drop URLs that are variants of one already in the batch
+    urls, seen = [], set()
+    for url in map(str, request.urls):
+        key = canonicalize_url(url)
+        if key not in seen:
+            seen.add(key)
+            urls.append(url)
+
+    if not urls:
+        return JSONResponse(
+            status_code=400, content={"success": False, "message": "No URLs given"}
+        )
+    if len(urls) > crawl_jobs.MAX_BATCH_SIZE:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "success": False,
+                "message": f"Too many URLs, maximum is {crawl_jobs.MAX_BATCH_SIZE}",
+            },
+        )
+
+    try:
+        job_id = crawl_jobs.start_job(urls)
+        return {"success": True, "job_id": job_id, "total": len(urls)}
+    except SQLAlchemyError as e:
+        logger.error(f"Database error: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "message": f"Database error: {str(e)}"},
+        )
+
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str, items: bool = True):
+    """Get progress of a batch crawl job"""
+    job = get_crawl_job(job_id, include_items=items)
+    if not job:
+        return JSONResponse(
+            status_code=404, content={"success": False, "message": "Job not found"}
+        )
+    return {"success": True, "job": job}
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, interval: float = 1.0):
+    """Stream batch crawl job progress as Server-Sent Events"""
+    job = await asyncio.to_thread(get_crawl_job, job_id)
+    if not job:
+        return JSONResponse(
+            status_code=404, content={"success": False, "message": "Job not found"}
+        )
+
+    async def event_stream(job):
+        item_states = {}
+        while True:
+            # Only send items whose state changed since the previous event
+            changed = [
+                item
+                for item in job.pop("items")
+                if item_states.get(item["id"]) != item["state"]
+            ]
+            item_states.update((item["id"], item["state"]) for item in changed)
+
+            if changed:
+                job["items"] = changed
+                yield f"event: progress\ndata: {json.dumps(job)}\n\n"
+
+            if job["status"] != "running":
+                yield f"event: done\ndata: {json.dumps(job)}\n\n"
+                break
+
+            await asyncio.sleep(max(0.2, interval))
+            job = await asyncio.to_thread(get_crawl_job, job_id)
+
+    return StreamingResponse(
+        event_stream(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
 @app.get("/api/status")
 async def get_status():
     """Get the status of the API"""
@@ -343,6 +584,17 @@ async def get_status():
             "status": "ok",
             "message": "API is running",
             "server_running": is_server_running,
+            "browser_pool": crawler.stats(),
+            "executors": {
+                "crawl": crawl_executor.stats(),
+                "http": http_executor.stats(),
+                "work": work_executor.stats(),
+            },
+            "db_write_queue": write_queue.depth(),
+            "page_cache": page_cache.stats() if page_cache else None,
+            "crawl_flights": crawl_flights.stats(),
+            "refresher": refresher.stats(),
+            "scheduler": crawl_scheduler.stats(),
         }
     except Exception as e:
         logger.error(f"Error getting status: {str(e)}")
@@ -351,12 +603,36 @@ async def get_status():
         )
 
 
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Crawl pipeline metrics in the Prometheus text format"""
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/api/pages")
-async def get_pages(url: str = None, title: str = None):
-    """Get all crawled pages with optional filtering"""
+def get_pages(
+    url: str = None,
+    title: str = None,
+    q: str = None,
+    fields: str = None,
+    cursor: str = None,
+    limit: int = None,
+):
+    """Get crawled pages with optional filtering, full-text search and cursor pagination"""
     session = get_session()
     try:
-        query = session.query(CrawledPage)
+        try:
+            selected_fields = parse_fields(fields)
+        except ValueError as e:
+            return JSONResponse(
+                status_code=400, content={"success": False, "message": str(e)}
+            )
+        limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+        # Only the requested columns are loaded, html is never read here
+        query = project_fields(session.query(CrawledPage), selected_fields)
 
         # Apply filters if provided
         if url:
@@ -365,10 +641,29 @@ async def get_pages(url: str = None, title: str = None):
             query = query.filter(CrawledPage.title.ilike(f"%{title}%"))
 
         # Get results
-        pages = query.order_by(CrawledPage.last_crawled_at.desc()).all()
-        results = [p.to_dict() for p in pages]
+        try:
+            if q:
+                # Search results are ranked by relevance, so they page by position
+                rows, next_cursor = offset_paginate(apply_search(query, q), cursor, limit)
+                snippets = search_snippets(q, [p.id for p in rows])
+                results = [
+                    {**p.to_dict(selected_fields), "snippet": snippets.get(p.id)}
+                    for p in rows
+                ]
+            else:
+                rows, next_cursor = keyset_paginate(query, cursor, limit)
+                results = [p.to_dict(selected_fields) for p in rows]
+        except ValueError as e:
+            return JSONResponse(
+                status_code=400, content={"success": False, "message": str(e)}
+            )
 
-        return {"success": True, "count": len(results), "pages": results}
+        return {
+            "success": True,
+            "count": len(results),
+            "pages": results,
+            "next_cursor": next_cursor,
+        }
     except SQLAlchemyError as e:
         logger.error(f"Database error: {str(e)}")
         return JSONResponse(
@@ -379,46 +674,95 @@ async def get_pages(url: str = None, title: str = None):
         session.close()
 
 
+@app.get("/api/export")
+def export_pages(
+    since: Optional[datetime] = None,
+    after_id: Optional[int] = None,
+    until: Optional[datetime] = None,
+    url: str = None,
+    fields: str = None,
+    gzip: bool = False,
+):
+    """
+    Stream crawled pages as NDJSON, oldest first, in constant memory.
+    Every line carries id and last_crawled_at; pass the last ones back as
+    since and after_id to resume an interrupted or incremental export.
+    """
+    try:
+        selected_fields = parse_fields(fields)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "message": str(e)})
+
+    def generate_lines():
+        buffer = []
+        size = 0
+        for page in iter_pages(selected_fields, since=since, after_id=after_id, until=until, url=url):
+            line = json.dumps(page, ensure_ascii=False) + "\n"
+            buffer.append(line)
+            size += len(line)
+            # Send reasonably sized chunks instead of one write per row
+            if size >= 65536:
+                yield "".join(buffer).encode("utf-8")
+                buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer).encode("utf-8")
+
+    def generate_gzip():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in generate_lines():
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    headers = {"Content-Disposition": 'attachment; filename="pages.ndjson"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        generate_gzip() if gzip else generate_lines(),
+        media_type="application/x-ndjson",
+        headers=headers,
+    )
+
+
+# Only the columns needed for clean JSON are read, never html
+CLEAN_JSON_FIELDS = ["url", "title", "description", "content"]
+STREAM_JSON_THRESHOLD = 200
+
+
+def clean_page_data(page):
+    """Normalize whitespace in page content for clean JSON output"""
+    content = page["content"].strip() if page["content"] else ""
+    if content:
+        # Remove excessive whitespace
+        content = " ".join(content.split())
+    return {**page, "content": content}
+
+
 # Get clean JSON data for specified page IDs
 @app.post("/api/get-clean-json")
-async def get_clean_json(request: PageIdsRequest):
+def get_clean_json(request: PageIdsRequest):
     """
     Get clean, normalized JSON data for the specified page IDs.
-    This endpoint retrieves pages by their IDs, cleans the content,
-    and returns properly formatted JSON.
+    This endpoint retrieves pages by their IDs in a few bulk queries,
+    cleans the content, and returns JSON in the requested order.
     """
     try:
-        # Initialize result list
-        result = []
-
-        # Get database session
-        session = get_session()
-
-        # Query database for requested pages
-        for page_id in request.ids:
-            page = session.query(CrawledPage).filter(CrawledPage.id == page_id).first()
-
-            if page:
-                # Convert to dictionary (without HTML)
-                page_data = {
-                    "url": page.url,
-                    "title": page.title,
-                    "description": page.description,
-                    "content": page.content.strip() if page.content else "",
-                }
+        pages = iter_pages_by_ids(request.ids, CLEAN_JSON_FIELDS)
 
-                # Clean and normalize the content
-                if page_data["content"]:
-                    # Remove excessive whitespace
-                    page_data["content"] = " ".join(page_data["content"].split())
+        # Large selections are streamed instead of built up in memory
+        if len(request.ids) > STREAM_JSON_THRESHOLD:
+            def generate():
+                yield "["
+                for index, page in enumerate(pages):
+                    prefix = "," if index else ""
+                    yield prefix + json.dumps(clean_page_data(page))
+                yield "]"
 
-                result.append(page_data)
-
-        # Close session
-        session.close()
+            return StreamingResponse(generate(), media_type="application/json")
 
         # Return clean JSON data
-        return JSONResponse(content=result)
+        return JSONResponse(content=[clean_page_data(page) for page in pages])
 
     except Exception as e:
         logger.error(f"Error getting clean JSON data: {str(e)}")
@@ -428,23 +772,57 @@ async def get_clean_json(request: PageIdsRequest):
         )
 
 
+@app.post("/api/reprocess")
+def start_reprocess(request: ReprocessRequest):
+    """Re-run the HTML cleaner over stored pages in the background"""
+    if not reprocess.start_reprocess(url=request.url, since=request.since, ids=request.ids):
+        return JSONResponse(
+            status_code=409,
+            content={"success": False, "message": "Reprocessing is already running"},
+        )
+    return {"success": True, "message": "Reprocessing started"}
+
+
+@app.get("/api/reprocess")
+def get_reprocess_status():
+    """Get progress of the current or last reprocess run"""
+    return {"success": True, **reprocess.get_status()}
+
+
 # API endpoint to close Chrome and clean up resources
 @app.get("/api/shutdown")
 async def api_shutdown():
     """API endpoint to close Chrome and return success status"""
     try:
         logger.info("Shutdown request received, closing browser...")
-        crawler.close_browser()
+        crawler.close_all()
         return {"success": True, "message": "Browser and resources closed successfully"}
     except Exception as e:
         logger.error(f"Error during shutdown: {str(e)}")
         return {"success": False, "message": f"Error during shutdown: {str(e)}"}
 
 
+@app.on_event("startup")
+async def startup_event():
+    """Warm up slow parts in the background once the server is starting to accept requests"""
+    log_startup_phase("server startup", phase_started)
+    threading.Thread(
+        target=prewarm,
+        kwargs={
+            "browsers": config.getint("server", "prewarm_browsers", fallback=0),
+            "cleaner": config.getboolean("server", "prewarm_cleaner", fallback=True),
+        },
+        name="prewarm",
+        daemon=True,
+    ).start()
+
+
 # Handle application shutdown
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up resources when shutting down"""
     logger.info("Shutting down application, closing browser...")
-    crawler.close_browser()
+    crawl_jobs.shutdown()
+    refresher.stop()
+    shutdown_crawl_service()
     logger.info("API shutting down, resources cleaned up.")
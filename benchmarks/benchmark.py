@@ -0,0 +1,510 @@
+"""Offline benchmarks for the cleaning, storage, API and crawl hot paths
+
+Runs against a throwaway working directory with its own config.ini and
+database, so the real data folder is never touched. From the repository root:
+
+    python benchmarks/benchmark.py run --output results.json
+    python benchmarks/benchmark.py compare baseline.json results.json
+"""
+import gc
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import statistics
+import tracemalloc
+import configparser
+from datetime import datetime, timedelta
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+
+SUITES = ("cleaner", "storage", "crawl", "api")
+# The news fixture is grown to this size at runtime instead of being stored in the repository
+NEWS_PAGE_BYTES = 5 * 1024 * 1024
+# A 1MB copy shows whether cleaning time grows linearly with page size
+SMALL_NEWS_PAGE_BYTES = 1024 * 1024
+# Per-MB cleaning time of the 5MB page over the 1MB one above this means superlinear cleaning
+MAX_CLEANER_SCALING = 1.5
+REPEAT_BLOCK = re.compile(r"<!-- repeat:start -->(.*?)<!-- repeat:end -->", re.S)
+# Fixtures a plain HTTP fetch can store, the SPA shell would need a browser
+CRAWL_FIXTURES = ("small_blog", "news_page", "indonesian_article", "indonesian_news")
+# Pages above this size are crawled fewer times, each run takes seconds
+LARGE_PAGE_BYTES = 1024 * 1024
+LARGE_PAGE_ITERATIONS = 3
+SEED_BATCH = 5000
+SEED_HOSTS = 50
+
+# Settings written over the repository config.ini in the benchmark working directory
+BENCH_CONFIG = {
+    "scheduler": {
+        "min_delay": "0",
+        "burst": "1000",
+        "max_per_host": "100",
+        "respect_robots": "false",
+    },
+    "crawler": {"warm_spare": "false"},
+    "profile": {"blocklist_file": os.path.join(REPO_DIR, "blocklist.txt")},
+    "refresher": {"enabled": "false"},
+    "server": {"prewarm_browsers": "0", "prewarm_cleaner": "false"},
+}
+
+
+def load_fixtures():
+    """Read the HTML fixtures, growing the news page to its benchmark size"""
+    fixtures = {}
+    for filename in sorted(os.listdir(FIXTURES_DIR)):
+        name, ext = os.path.splitext(filename)
+        if ext == ".html":
+            with open(os.path.join(FIXTURES_DIR, filename), encoding="utf-8") as f:
+                fixtures[name] = f.read()
+    fixtures["news_page_1mb"] = expand_page(fixtures["news_page"], SMALL_NEWS_PAGE_BYTES)
+    fixtures["news_page"] = expand_page(fixtures["news_page"], NEWS_PAGE_BYTES)
+    return fixtures
+
+
+def expand_page(html, size):
+    """Repeat the marked block of a page, renumbering ids, until the page reaches a size in bytes"""
+    match = REPEAT_BLOCK.search(html)
+    if not match:
+        return html
+    block = match.group(1)
+    blocks = []
+    total = len(html.encode("utf-8"))
+    number = 1001
+    while total < size:
+        copy = block.replace("c-1001", f"c-{number}")
+        blocks.append(copy)
+        total += len(copy.encode("utf-8"))
+        number += 1
+    return html[: match.start()] + "".join(blocks) + html[match.end() :]
+
+
+def prepare_workdir(workdir):
+    """Write a benchmark config.ini into the working directory and switch to it
+
+    Every module reads config.ini from the current directory when imported,
+    so this has to run before anything from the repository is imported.
+    """
+    config = configparser.ConfigParser()
+    config.read(os.path.join(REPO_DIR, "config.ini"))
+    for section, values in BENCH_CONFIG.items():
+        if not config.has_section(section):
+            config.add_section(section)
+        for key, value in values.items():
+            config.set(section, key, value)
+    with open(os.path.join(workdir, "config.ini"), "w", encoding="utf-8") as f:
+        config.write(f)
+
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+
+
+def quiet_logs():
+    """Only log warnings, per-request info logging would dominate the timings
+
+    Logging is set up once per process, so the API keeps this setup when imported.
+    """
+    from log_setup import setup_logging
+
+    setup_logging(level="WARNING", log_file=False)
+
+
+def record(results, name, value, unit, better):
+    """Store one measurement, "better" tells compare which direction is an improvement"""
+    results[name] = {"value": round(value, 4), "unit": unit, "better": better}
+
+
+def record_latencies(results, name, samples):
+    """Store the median and 95th percentile of latency samples in milliseconds"""
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    record(results, f"{name}.median_ms", statistics.median(samples) * 1000, "ms", "lower")
+    record(results, f"{name}.p95_ms", p95 * 1000, "ms", "lower")
+
+
+def repeat(fn, min_runs, min_seconds):
+    """Call fn until it ran at least min_runs times and for min_seconds, returning each duration"""
+    durations = []
+    started = time.perf_counter()
+    while len(durations) < min_runs or time.perf_counter() - started < min_seconds:
+        run_started = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - run_started)
+    return durations
+
+
+def bench_cleaner(fixtures, results, min_seconds):
+    """HtmlCleaner.process_page throughput and peak Python memory per fixture"""
+    from html_cleaner import HtmlCleaner
+
+    # The first call pays for imports and parser setup
+    HtmlCleaner.process_page({"url": "https://bench.example/", "html": fixtures["small_blog"]})
+
+    for name, html in fixtures.items():
+        crawled_data = {"url": f"https://bench.example/{name}", "html": html}
+        # Garbage left by the previous fixture should not be collected on this one's clock
+        gc.collect()
+        durations = repeat(
+            lambda: HtmlCleaner.process_page(dict(crawled_data)), 3, min_seconds
+        )
+        seconds = sum(durations)
+        megabytes = len(html.encode("utf-8")) / 1024 / 1024
+        record(results, f"cleaner.{name}.pages_per_sec", len(durations) / seconds, "pages/s", "higher")
+        record(results, f"cleaner.{name}.mb_per_sec", megabytes * len(durations) / seconds, "MB/s", "higher")
+
+        # Traced separately, tracemalloc slows the timed runs down
+        tracemalloc.start()
+        HtmlCleaner.process_page(dict(crawled_data))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        record(results, f"cleaner.{name}.peak_memory_mb", peak / 1024 / 1024, "MB", "lower")
+        print(f"  cleaner {name}: {len(durations) / seconds:.1f} pages/s")
+
+    # 1.0 when cleaning is linear in page size
+    scaling = (
+        results["cleaner.news_page_1mb.mb_per_sec"]["value"]
+        / results["cleaner.news_page.mb_per_sec"]["value"]
+    )
+    record(results, "cleaner.news_page.scaling", scaling, "x", "lower")
+    if scaling > MAX_CLEANER_SCALING:
+        print(f"  WARNING: cleaning 5MB is {scaling:.2f}x slower per MB than 1MB")
+
+
+def seed_url(number):
+    return f"https://seed{number % SEED_HOSTS}.example/page/{number}"
+
+
+def seed_pages(target, content):
+    """Insert generated pages in bulk until target of them are stored, returning their number"""
+    from sqlalchemy import func, insert
+    from database import get_session, CrawledPage
+
+    words = content.split()
+    now = datetime.now()
+    session = get_session()
+    try:
+        # Pages saved by the storage suite do not count, seeded ones are numbered without gaps
+        current = (
+            session.query(func.count(CrawledPage.id))
+            .filter(CrawledPage.url.like("https://seed%"))
+            .scalar()
+        )
+        for start in range(current, target, SEED_BATCH):
+            rows = []
+            for number in range(start, min(target, start + SEED_BATCH)):
+                # Rotated text keeps the full-text index from holding one document many times
+                offset = number % len(words)
+                rows.append({
+                    "url": seed_url(number),
+                    "title": f"Seed page {number}",
+                    "description": f"Generated page {number} for benchmarks",
+                    "content": " ".join(words[offset:] + words[:offset]),
+                    "last_crawled_at": now - timedelta(seconds=number),
+                    "access_count": 0,
+                })
+            session.execute(insert(CrawledPage), rows)
+            session.commit()
+        return max(current, target)
+    finally:
+        session.close()
+
+
+def bench_storage(fixtures, results, row_counts, operations):
+    """save_crawled_page and get_crawled_page operations per second at each table size"""
+    import database
+    from database import save_crawled_page, get_crawled_page
+    from html_cleaner import HtmlCleaner
+
+    page = HtmlCleaner.process_page({"url": "https://bench.example/", "html": fixtures["small_blog"]})
+    rng = random.Random(0)
+
+    for rows in row_counts:
+        started = time.perf_counter()
+        seeded = seed_pages(rows, page["content"])
+        print(f"  seeded {seeded} rows in {time.perf_counter() - started:.1f}s")
+
+        def save(number):
+            # A unique comment gives every save its own HTML blob, as real pages would
+            save_crawled_page(
+                url=f"https://bench.example/saved/{rows}/{number}",
+                title=page["title"],
+                description=page["description"],
+                content=page["content"],
+                html=page["html"].replace("</body>", f"<!-- {rows}-{number} --></body>"),
+            )
+
+        durations = [_timed(save, number) for number in range(operations)]
+        record(results, f"storage.{rows}.save_ops_per_sec", len(durations) / sum(durations), "ops/s", "higher")
+        record_latencies(results, f"storage.{rows}.save", durations)
+
+        # Reads straight from the database, with the page cache out of the way
+        urls = [seed_url(rng.randrange(seeded)) for _ in range(operations)]
+        cache, database.page_cache = database.page_cache, None
+        try:
+            durations = [_timed(get_crawled_page, url) for url in urls]
+        finally:
+            database.page_cache = cache
+        record(results, f"storage.{rows}.get_ops_per_sec", len(durations) / sum(durations), "ops/s", "higher")
+        record_latencies(results, f"storage.{rows}.get", durations)
+
+        # Reads of a small hot set, answered by the page cache when it is enabled
+        hot = urls[:20]
+        for url in hot:
+            get_crawled_page(url)
+        durations = [_timed(get_crawled_page, hot[number % len(hot)]) for number in range(operations)]
+        record(results, f"storage.{rows}.get_cached_ops_per_sec", len(durations) / sum(durations), "ops/s", "higher")
+        print(f"  storage at {rows} rows done")
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Static file handler that does not log every request"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_fixtures(fixtures, workdir):
+    """Serve the fixtures from a local HTTP server standing in for real sites, returning its base URL"""
+    site_dir = os.path.join(workdir, "site")
+    os.makedirs(site_dir, exist_ok=True)
+    for name, html in fixtures.items():
+        with open(os.path.join(site_dir, f"{name}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=site_dir))
+    threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def bench_crawl(client, fixtures, base_url, results, iterations):
+    """End-to-end /api/crawl latency against the local server, plus stored and revalidated pages"""
+    from crawl_service import crawl_and_store
+
+    for name in CRAWL_FIXTURES:
+        url = f"{base_url}/{name}.html"
+        runs = iterations
+        if len(fixtures[name]) > LARGE_PAGE_BYTES:
+            runs = min(iterations, LARGE_PAGE_ITERATIONS)
+
+        # A new query string per run makes every request a full fetch, clean and save
+        fresh, stored = [], []
+        for run in range(runs):
+            run_url = f"{url}?run={run}"
+            fresh.append(_timed(_post_crawl, client, run_url))
+            stored.append(_timed(_post_crawl, client, run_url))
+        record_latencies(results, f"crawl.{name}.fresh", fresh)
+        record_latencies(results, f"crawl.{name}.stored", stored)
+
+        # The server answers 304 to the stored Last-Modified, so only the crawl date is bumped
+        revalidated = [_timed(crawl_and_store, f"{url}?run=0") for _ in range(runs)]
+        record_latencies(results, f"crawl.{name}.revalidated", revalidated)
+        print(f"  crawl {name} done")
+
+
+def _post_crawl(client, url):
+    response = client.post("/api/crawl", json={"url": url})
+    if response.status_code != 200 or not response.json().get("success"):
+        raise RuntimeError(f"Crawl of {url} failed: {response.text[:200]}")
+
+
+def bench_api(client, results, requests_count):
+    """Latency of /api/pages listings and searches and of the / dashboard"""
+    first = client.get("/api/pages").json()
+    cases = {
+        "api.pages": "/api/pages",
+        "api.pages_next": f"/api/pages?cursor={first['next_cursor']}",
+        "api.pages_fields": "/api/pages?fields=id,url,title&limit=200",
+        "api.pages_search": "/api/pages?q=sourdough starter",
+        "api.dashboard": "/",
+        "api.dashboard_search": "/?q=sourdough",
+    }
+    for name, path in cases.items():
+        # Warm up connections and caches before timing
+        for _ in range(3):
+            client.get(path)
+
+        def get():
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {path} answered {response.status_code}")
+
+        durations = [_timed(get) for _ in range(requests_count)]
+        record_latencies(results, name, durations)
+        print(f"  {name} done")
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    """Run the selected suites and write their results as JSON"""
+    suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise SystemExit(f"Unknown suites: {', '.join(sorted(unknown))}")
+    row_counts = sorted(int(rows) for rows in args.rows.split(","))
+    output = os.path.abspath(args.output)
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    fixtures = load_fixtures()
+    workdir = tempfile.mkdtemp(prefix="crawler-bench-")
+    cwd = os.getcwd()
+    results = {}
+    try:
+        prepare_workdir(workdir)
+        quiet_logs()
+        import database
+        from html_cleaner import parser_backend
+
+        database.init_db(migrate_html=False)
+
+        if "cleaner" in suites:
+            print("Cleaner")
+            bench_cleaner(fixtures, results, args.min_time)
+        if "storage" in suites:
+            print("Storage")
+            bench_storage(fixtures, results, row_counts, args.operations)
+
+        if "crawl" in suites or "api" in suites:
+            from fastapi.testclient import TestClient
+            from html_cleaner import HtmlCleaner
+
+            import api
+
+            # The API lists whatever the storage suite left, or a table of the smallest size
+            page = HtmlCleaner.process_page({"url": "", "html": fixtures["small_blog"]})
+            seed_pages(row_counts[0], page["content"])
+
+            server, base_url = serve_fixtures(fixtures, workdir)
+            try:
+                with TestClient(api.app) as client:
+                    if "crawl" in suites:
+                        print("Crawl")
+                        bench_crawl(client, fixtures, base_url, results, args.iterations)
+                    if "api" in suites:
+                        print("API")
+                        bench_api(client, results, args.requests)
+            finally:
+                server.shutdown()
+                server.server_close()
+
+        report = {
+            "meta": {
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "parser": parser_backend(),
+                "suites": suites,
+                "rows": row_counts,
+            },
+            "results": results,
+        }
+        database.engine.dispose()
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            print(f"Working directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if baseline:
+        return compare_files(baseline, output, args.threshold)
+    return 0
+
+
+def compare_files(baseline_path, current_path, threshold):
+    """Print how results changed against a baseline, returning 1 when any regressed beyond the threshold"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(current_path, encoding="utf-8") as f:
+        current = json.load(f)
+
+    print(
+        f"Comparing {current['meta'].get('revision')} against "
+        f"{baseline['meta'].get('revision')} (threshold {threshold}%)"
+    )
+    regressions = 0
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if not old or not old["value"]:
+            print(f"  {name}: {result['value']} {result['unit']} (new)")
+            continue
+
+        change = (result["value"] - old["value"]) / old["value"] * 100
+        worse = -change if result["better"] == "higher" else change
+        status = ""
+        if worse > threshold:
+            status = "  REGRESSION"
+            regressions += 1
+        elif worse < -threshold:
+            status = "  improved"
+        print(
+            f"  {name}: {old['value']} -> {result['value']} {result['unit']} "
+            f"({change:+.1f}%){status}"
+        )
+
+    print(f"{regressions} regressions")
+    return 1 if regressions else 0
+
+
+def main():
+    """Command line entry point for running and comparing benchmarks"""
+    parser = argparse.ArgumentParser(description="Benchmark the crawler's hot paths")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run benchmarks and write the results as JSON")
+    run_parser.add_argument("--suites", default=",".join(SUITES), help="comma separated suites to run")
+    run_parser.add_argument("--rows", default="10000,100000", help="table sizes for the storage suite")
+    run_parser.add_argument("--operations", type=int, default=1000, help="saves and reads per table size")
+    run_parser.add_argument("--requests", type=int, default=200, help="requests per API endpoint")
+    run_parser.add_argument("--iterations", type=int, default=20, help="crawls per fixture")
+    run_parser.add_argument("--min-time", type=float, default=2.0, help="seconds to run each cleaner fixture")
+    run_parser.add_argument("--output", default="benchmark-results.json", help="JSON file for the results")
+    run_parser.add_argument("--compare", help="baseline JSON file to compare the results against")
+    run_parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    run_parser.add_argument("--keep", action="store_true", help="keep the working directory and database")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        sys.exit(run(args))
+    sys.exit(compare_files(args.baseline, args.current, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
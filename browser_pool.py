@@ -0,0 +1,186 @@
+import configparser
+import threading
+import queue
+from contextlib import contextmanager
+from loguru import logger
+
+from selenium_crawler import SeleniumCrawler
+from metrics import BROWSER_CHECKOUT
+
+
+class BrowserPool:
+    """Pool of SeleniumCrawler instances with checkout/return semantics"""
+
+    def __init__(self, size=None, max_pages_per_browser=None):
+        # Read configuration
+        self.config = configparser.ConfigParser()
+        self.config.read("config.ini")
+
+        self.size = size or self.config.getint("crawler", "pool_size", fallback=2)
+        self.size = max(1, self.size)
+        if max_pages_per_browser is None:
+            max_pages_per_browser = self.config.getint(
+                "crawler", "max_pages_per_browser", fallback=100
+            )
+        self.max_pages_per_browser = max_pages_per_browser
+        self.checkout_timeout = self.config.getint(
+            "crawler", "checkout_timeout", fallback=120
+        )
+        # A started spare browser replaces a recycled one without a cold start
+        self.warm_spare = self.config.getboolean("crawler", "warm_spare", fallback=True)
+        # Attempts on another browser when a crawl fails because its browser broke
+        self.crawl_retries = self.config.getint("crawler", "crawl_retries", fallback=1)
+
+        # Crawlers are created up front but start their browser lazily on first crawl
+        self._crawlers = [SeleniumCrawler() for _ in range(self.size)]
+        self._idle = queue.Queue()
+        for crawler in self._crawlers:
+            self._idle.put(crawler)
+
+        self._lock = threading.Lock()
+        self._spare = None
+        self._warming = False
+        # Set by close_all, no browser is kept or warmed up after it
+        self._closed = False
+
+    def _start_spare(self):
+        """Start a spare browser in the background if there is none yet"""
+        with self._lock:
+            if self._closed or not self.warm_spare or self._spare is not None or self._warming:
+                return
+            self._warming = True
+        threading.Thread(target=self._warm, name="browser-spare", daemon=True).start()
+
+    def _warm(self):
+        try:
+            spare = SeleniumCrawler()
+            if spare._initialize_browser():
+                with self._lock:
+                    closed = self._closed
+                    if not closed:
+                        self._spare = spare
+                if closed:
+                    # The pool was closed while this browser was starting
+                    spare.close_browser()
+                    return
+                logger.info("Spare browser ready.")
+        finally:
+            with self._lock:
+                self._warming = False
+
+    def _take_spare(self):
+        with self._lock:
+            spare, self._spare = self._spare, None
+            return spare
+
+    def _recycle(self, crawler, reason):
+        """Replace a crawler's browser, with the warm spare when one is ready"""
+        logger.info(f"Recycling browser ({reason})")
+        crawler.close_browser()
+        crawler.pages_crawled = 0
+        crawler.healthy = True
+
+        spare = self._take_spare()
+        if spare is not None:
+            with self._lock:
+                self._crawlers[self._crawlers.index(crawler)] = spare
+            crawler = spare
+            logger.info("Swapped in spare browser.")
+        self._start_spare()
+        return crawler
+
+    def checkout(self, timeout=None):
+        """Take an idle crawler from the pool, waiting until one is available"""
+        try:
+            with BROWSER_CHECKOUT.time():
+                return self._idle.get(
+                    timeout=timeout if timeout is not None else self.checkout_timeout
+                )
+        except queue.Empty:
+            raise TimeoutError("No browser available in pool")
+
+    def release(self, crawler):
+        """Return a crawler to the pool, recycling it if needed"""
+        with self._lock:
+            closed = self._closed
+        if closed:
+            # A crawl that was running when the pool closed leaves no browser behind
+            crawler.close_browser()
+        elif not crawler.healthy:
+            crawler = self._recycle(crawler, "unhealthy after WebDriver error")
+        elif (
+            self.max_pages_per_browser
+            and crawler.pages_crawled >= self.max_pages_per_browser
+        ):
+            crawler = self._recycle(crawler, f"{crawler.pages_crawled} pages crawled")
+        elif crawler.browser is not None:
+            # Keep a spare ready once the pool is actually in use
+            self._start_spare()
+        self._idle.put(crawler)
+
+    @contextmanager
+    def browser(self, timeout=None):
+        """Context manager that checks out a crawler and always returns it"""
+        crawler = self.checkout(timeout)
+        try:
+            yield crawler
+        finally:
+            self.release(crawler)
+
+    def crawl_url(self, url):
+        """Crawl a URL on the next available browser, retrying on another one if the browser failed"""
+        for attempt in range(self.crawl_retries + 1):
+            with self.browser() as crawler:
+                crawled_data = crawler.crawl_url(url)
+                browser_failed = crawler.last_error == "webdriver"
+            if crawled_data or not browser_failed:
+                return crawled_data
+            if attempt < self.crawl_retries:
+                logger.info(f"Retrying {url} on another browser")
+        return None
+
+    def prewarm(self, count=None):
+        """Start idle browsers ahead of the first crawl, returns how many were started"""
+        count = self.size if count is None else min(count, self.size)
+        started = 0
+        for _ in range(count):
+            try:
+                crawler = self.checkout(timeout=0)
+            except TimeoutError:
+                # Every browser is already busy crawling
+                break
+            try:
+                if crawler.browser is None and crawler._initialize_browser():
+                    started += 1
+            finally:
+                self.release(crawler)
+        return started
+
+    def stats(self):
+        """Get health and usage information for each pooled browser"""
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "spare_ready": self._spare is not None,
+            "browsers": [
+                {
+                    "started": crawler.browser is not None,
+                    "healthy": crawler.healthy,
+                    "pages_crawled": crawler.pages_crawled,
+                    "errors": crawler.error_count,
+                }
+                for crawler in self._crawlers
+            ],
+        }
+
+    def close_all(self):
+        """Close every browser in the pool and stop keeping or warming up browsers"""
+        with self._lock:
+            self._closed = True
+            spare, self._spare = self._spare, None
+        if spare is not None:
+            spare.close_browser()
+        with self._lock:
+            for crawler in self._crawlers:
+                crawler.close_browser()
+        logger.info("All pooled browsers closed.")
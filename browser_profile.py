@@ -0,0 +1,136 @@
+import configparser
+import os
+from urllib.parse import urlparse
+from loguru import logger
+
+# URL patterns for Network.setBlockedURLs by resource category, images are blocked through prefs
+RESOURCE_PATTERNS = {
+    "fonts": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "media": [
+        "*.mp4", "*.webm", "*.ogg", "*.ogv", "*.mp3", "*.m4a", "*.wav", "*.m3u8", "*.mpd",
+        "*.mov", "*.avi",
+    ],
+}
+CATEGORIES = ("images", "fonts", "media", "trackers")
+
+
+def load_blocklist(path):
+    """Read URL patterns from a blocklist file, one per line, # starts a comment"""
+    if not path or not os.path.exists(path):
+        return []
+    patterns = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                patterns.append(line)
+    return patterns
+
+
+class BrowserProfile:
+    """Extraction profile: headless Chrome that skips images, fonts, media and trackers"""
+
+    def __init__(self, config=None):
+        # Read configuration
+        if config is None:
+            config = configparser.ConfigParser()
+            config.read("config.ini")
+
+        self.headless = config.getboolean("profile", "headless", fallback=True)
+        self.page_load_strategy = config.get(
+            "profile", "page_load_strategy", fallback="eager"
+        )
+        self.blocked = {
+            category: config.getboolean("profile", f"block_{category}", fallback=True)
+            for category in CATEGORIES
+        }
+
+        self.tracker_patterns = load_blocklist(
+            config.get("profile", "blocklist_file", fallback="blocklist.txt")
+        )
+        self.tracker_patterns += [
+            pattern.strip()
+            for pattern in config.get("profile", "block_patterns", fallback="").split(",")
+            if pattern.strip()
+        ]
+
+        # Per-domain categories let through for sites that break without them, or "all"
+        self.overrides = {}
+        if config.has_section("profile_overrides"):
+            for domain, allowed in config.items("profile_overrides"):
+                allowed = {item.strip().lower() for item in allowed.split(",") if item.strip()}
+                if "all" in allowed:
+                    allowed = set(CATEGORIES)
+                self.overrides[domain.lower()] = allowed
+
+        # Patterns last sent to the browser, so they are only resent when they change
+        self._active_patterns = None
+
+    def allowed_for(self, url):
+        """Categories let through for a URL's host, matching parent domains too"""
+        host = (urlparse(url).hostname or "").lower()
+        while host:
+            if host in self.overrides:
+                return self.overrides[host]
+            if "." not in host:
+                break
+            host = host.split(".", 1)[1]
+        return set()
+
+    def blocked_patterns(self, url):
+        """URL patterns to block while loading a URL"""
+        allowed = self.allowed_for(url)
+        patterns = []
+        for category, blocked in self.blocked.items():
+            if not blocked or category in allowed:
+                continue
+            if category == "trackers":
+                patterns += self.tracker_patterns
+            else:
+                patterns += RESOURCE_PATTERNS.get(category, [])
+        return patterns
+
+    def apply_options(self, chrome_options):
+        """Set launch options of the profile on Chrome options"""
+        if self.headless:
+            chrome_options.add_argument("--headless=new")
+            chrome_options.add_argument("--window-size=1280,800")
+        else:
+            chrome_options.add_argument("--window-size=800,600")
+            chrome_options.add_argument("--start-minimized")
+
+        chrome_options.add_argument("--mute-audio")
+        chrome_options.add_argument("--autoplay-policy=user-gesture-required")
+        if self.page_load_strategy:
+            chrome_options.page_load_strategy = self.page_load_strategy
+
+        # Images are skipped by a content setting, domains that need them get an exception
+        if self.blocked["images"]:
+            prefs = {"profile.default_content_setting_values.images": 2}
+            exceptions = {
+                f"[*.]{domain},*": {"setting": 1}
+                for domain, allowed in self.overrides.items()
+                if "images" in allowed
+            }
+            if exceptions:
+                prefs["profile.content_settings.exceptions.images"] = exceptions
+            chrome_options.add_experimental_option("prefs", prefs)
+
+    def setup(self, browser):
+        """Enable request blocking on a freshly started browser"""
+        self._active_patterns = None
+        try:
+            browser.execute_cdp_cmd("Network.enable", {})
+        except Exception as e:
+            logger.warning(f"Request blocking unavailable: {str(e)}")
+
+    def before_navigation(self, browser, url):
+        """Block the URL patterns that apply to the page about to be loaded"""
+        patterns = self.blocked_patterns(url)
+        if self._active_patterns == patterns:
+            return
+        try:
+            browser.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+            self._active_patterns = patterns
+        except Exception as e:
+            logger.warning(f"Could not set blocked URLs: {str(e)}")
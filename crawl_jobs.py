@@ -0,0 +1,118 @@
+import configparser
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+from crawl_service import crawler, crawl_scheduler, crawl_and_store
+from crawl_scheduler import CrawlScheduler, HostThrottled
+from task_executor import DelayedCalls
+from database import (
+    create_crawl_job,
+    get_job_items,
+    update_job_item,
+    get_unfinished_job_ids,
+    should_recrawl,
+)
+
+# Read configuration
+config = configparser.ConfigParser()
+config.read("config.ini")
+
+MAX_BATCH_SIZE = config.getint("jobs", "max_batch_size", fallback=1000)
+# Times an item is put back for a rate limited host before it is marked failed
+MAX_THROTTLED_RETRIES = 5
+
+# Seconds before an item whose host is busy is tried again
+MIN_REQUEUE_DELAY = 0.5
+
+# Batch items share one worker per pooled browser, in submission order
+job_executor = ThreadPoolExecutor(max_workers=crawler.size, thread_name_prefix="job")
+# Items waiting for their host are queued again from here instead of sleeping on a worker
+job_retries = DelayedCalls("job-retry")
+
+
+def _submit_item(item_id, url, checked_at, throttled=0):
+    job_executor.submit(_crawl_item, item_id, url, checked_at, throttled)
+
+
+def _crawl_item(item_id, url, checked_at, throttled=0):
+    """Crawl a single job item and record its outcome, or queue it again while its host is busy"""
+    try:
+        crawl_scheduler.prepare(url)
+        try:
+            wait = crawl_scheduler.try_acquire(url)
+        except HostThrottled as e:
+            # Batches are not in a hurry, come back once the host's backoff is over
+            if throttled >= MAX_THROTTLED_RETRIES:
+                raise
+            logger.info(f"Retrying {url} in {e.retry_after} seconds: {str(e)}")
+            job_retries.call_later(
+                e.retry_after, _submit_item, item_id, url, checked_at, throttled + 1
+            )
+            return
+        if wait:
+            # The worker moves on to items of other hosts meanwhile
+            job_retries.call_later(
+                max(wait, MIN_REQUEUE_DELAY), _submit_item, item_id, url, checked_at, throttled
+            )
+            return
+
+        try:
+            update_job_item(item_id, "running")
+            page = crawl_and_store(url, since=checked_at, slot_held=True)
+        finally:
+            crawl_scheduler.release(url)
+
+        if page:
+            update_job_item(item_id, "done")
+        else:
+            update_job_item(item_id, "failed", "Failed to crawl URL")
+    except Exception as e:
+        logger.error(f"Error crawling job item {url}: {str(e)}")
+        update_job_item(item_id, "failed", f"Error: {str(e)}")
+
+
+def _dispatch_job(job_id):
+    """Mark fresh URLs as cached and queue the rest for crawling"""
+    queued = 0
+    # Items crawled by someone else after this check are not crawled again
+    checked_at = datetime.now()
+    # Interleave hosts so the workers are not all waiting on the same one
+    items = CrawlScheduler.interleave(
+        get_job_items(job_id, states=["pending", "running"]), key=lambda item: item[1]
+    )
+    for item_id, url in items:
+        try:
+            if not should_recrawl(url):
+                update_job_item(item_id, "cached", "Retrieved from cache")
+                continue
+        except Exception as e:
+            update_job_item(item_id, "failed", f"Error: {str(e)}")
+            continue
+
+        job_executor.submit(_crawl_item, item_id, url, checked_at)
+        queued += 1
+
+    logger.info(f"Job {job_id}: {queued} URLs queued for crawling")
+
+
+def start_job(urls):
+    """Create a batch crawl job and start dispatching it in the background"""
+    job_id = create_crawl_job(urls)
+    logger.info(f"Created crawl job {job_id} with {len(urls)} URLs")
+    threading.Thread(target=_dispatch_job, args=(job_id,), daemon=True).start()
+    return job_id
+
+
+def resume_jobs():
+    """Re-dispatch items of jobs interrupted by a server restart"""
+    for job_id in get_unfinished_job_ids():
+        logger.info(f"Resuming crawl job {job_id}")
+        threading.Thread(target=_dispatch_job, args=(job_id,), daemon=True).start()
+
+
+def shutdown():
+    """Stop crawling queued job items"""
+    job_retries.shutdown()
+    job_executor.shutdown(wait=False, cancel_futures=True)
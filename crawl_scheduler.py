@@ -0,0 +1,271 @@
+import asyncio
+import configparser
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+from loguru import logger
+
+from http_fetcher import get_domain, header_value
+from task_executor import ExecutorBusy
+
+# Read configuration
+config = configparser.ConfigParser()
+config.read("config.ini")
+
+# Responses that mean the host wants us to slow down
+THROTTLE_STATUSES = (429, 503)
+
+
+class HostThrottled(ExecutorBusy):
+    """Raised when a host would not allow another request within the maximum wait"""
+
+    def __init__(self, host, retry_after):
+        super().__init__(host, retry_after)
+        self.args = (f"Host {host} is rate limited, retry in {retry_after} seconds",)
+
+
+class HostState:
+    """Token bucket, concurrency and backoff state of a single host"""
+
+    def __init__(self, burst):
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.active = 0
+        self.crawl_delay = 0.0
+        self.backoff = 1.0
+        self.blocked_until = 0.0
+        self.robots_checked_at = None
+        self.requests = 0
+        self.throttled = 0
+
+
+class CrawlScheduler:
+    """Per-host politeness: token buckets, concurrency caps, robots.txt crawl-delay and adaptive backoff"""
+
+    def __init__(self, session=None):
+        self.enabled = config.getboolean("scheduler", "enabled", fallback=True)
+        self.min_delay = config.getfloat("scheduler", "min_delay", fallback=1.0)
+        self.burst = max(1, config.getint("scheduler", "burst", fallback=2))
+        self.max_per_host = max(1, config.getint("scheduler", "max_per_host", fallback=2))
+        self.max_wait = config.getfloat("scheduler", "max_wait", fallback=60)
+        self.max_backoff = config.getfloat("scheduler", "max_backoff", fallback=300)
+        self.respect_robots = config.getboolean("scheduler", "respect_robots", fallback=True)
+        self.max_crawl_delay = config.getfloat("scheduler", "max_crawl_delay", fallback=30)
+        self.robots_ttl = config.getfloat("scheduler", "robots_ttl_hours", fallback=24) * 3600
+        self.user_agent = config.get("fetcher", "user_agent", fallback="") or "*"
+
+        self.session = session
+        self._hosts = {}
+        self._condition = threading.Condition()
+
+    def _host(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(self.burst)
+        return state
+
+    def _delay(self, state):
+        """Seconds between requests to a host, including robots.txt and backoff"""
+        return max(self.min_delay, state.crawl_delay) * state.backoff
+
+    def _refill(self, state, now):
+        delay = self._delay(state)
+        rate = 1 / delay if delay > 0 else float("inf")
+        state.tokens = min(self.burst, state.tokens + (now - state.updated) * rate)
+        state.updated = now
+
+    def _load_robots(self, url, host):
+        """Fetch robots.txt of a host once per ttl and remember its crawl delay"""
+        with self._condition:
+            state = self._host(host)
+            now = time.monotonic()
+            checked_at = state.robots_checked_at
+            if checked_at is not None and now - checked_at < self.robots_ttl:
+                return
+            # Mark first so concurrent requests for the host do not all fetch it
+            state.robots_checked_at = now
+
+        delay = 0.0
+        parts = urlsplit(url)
+        try:
+            response = self.session.get(f"{parts.scheme}://{parts.netloc}/robots.txt", timeout=10)
+            if response.status_code == 200:
+                parser = RobotFileParser()
+                parser.parse(response.text.splitlines())
+                delay = parser.crawl_delay(self.user_agent) or 0.0
+                rate = parser.request_rate(self.user_agent)
+                if rate and rate.requests:
+                    delay = max(delay, rate.seconds / rate.requests)
+        except Exception as e:
+            logger.warning(f"Could not read robots.txt of {host}: {str(e)}")
+
+        with self._condition:
+            state.crawl_delay = min(float(delay), self.max_crawl_delay)
+        if delay:
+            logger.info(f"robots.txt of {host} asks for {delay} seconds between requests")
+
+    def prepare(self, url):
+        """Read robots.txt of the URL's host when it is due, the only step that does network I/O"""
+        if self.enabled and self.respect_robots and self.session is not None:
+            self._load_robots(url, get_domain(url))
+
+    def _take(self, state, now):
+        """Take a slot if the host allows a request now, otherwise return the seconds to wait"""
+        self._refill(state, now)
+        if state.active < self.max_per_host and state.tokens >= 1 and now >= state.blocked_until:
+            state.tokens -= 1
+            state.active += 1
+            state.requests += 1
+            return 0
+        # Until a token refills or the backoff ends; a release may free a slot sooner
+        return max(state.blocked_until - now, (1 - state.tokens) * self._delay(state), 0.05)
+
+    def try_acquire(self, url):
+        """Take a slot for the URL's host without waiting
+
+        Returns 0 once the slot is taken, otherwise how many seconds to wait
+        before trying again. Raises HostThrottled when the host is backing off
+        for longer than the maximum wait.
+        """
+        if not self.enabled:
+            return 0
+        host = get_domain(url)
+        with self._condition:
+            state = self._host(host)
+            now = time.monotonic()
+            wait = self._take(state, now)
+            if state.blocked_until - now > self.max_wait:
+                raise HostThrottled(host, max(1, int(round(wait))))
+            return wait
+
+    def acquire(self, url):
+        """Wait until a request to the URL's host is allowed, or raise HostThrottled"""
+        if not self.enabled:
+            return
+        self.prepare(url)
+
+        host = get_domain(url)
+        deadline = time.monotonic() + self.max_wait
+        with self._condition:
+            state = self._host(host)
+            while True:
+                now = time.monotonic()
+                wait = self._take(state, now)
+                if not wait:
+                    return
+                if now + wait > deadline:
+                    raise HostThrottled(host, max(1, int(round(wait))))
+                self._condition.wait(min(wait, deadline - now))
+
+    async def acquire_async(self, url):
+        """Wait for a slot from the event loop, without holding a thread while waiting"""
+        if not self.enabled:
+            return
+        await asyncio.to_thread(self.prepare, url)
+
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            wait = self.try_acquire(url)
+            if not wait:
+                return
+            now = time.monotonic()
+            if now + wait > deadline:
+                raise HostThrottled(get_domain(url), max(1, int(round(wait))))
+            await asyncio.sleep(min(wait, deadline - now))
+
+    def release(self, url):
+        """Free the host slot taken by acquire"""
+        if not self.enabled:
+            return
+        with self._condition:
+            state = self._host(get_domain(url))
+            state.active = max(0, state.active - 1)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, url):
+        """Hold a politeness slot for the URL's host while fetching it"""
+        self.acquire(url)
+        try:
+            yield
+        finally:
+            self.release(url)
+
+    @asynccontextmanager
+    async def async_slot(self, url):
+        """Hold a politeness slot from the event loop while fetching the URL"""
+        await self.acquire_async(url)
+        try:
+            yield
+        finally:
+            self.release(url)
+
+    def record(self, url, status, headers=None):
+        """Adapt a host's pace to a response: back off on 429/503, recover on success"""
+        if not status:
+            return
+        with self._condition:
+            state = self._host(get_domain(url))
+            if status in THROTTLE_STATUSES:
+                state.throttled += 1
+                state.backoff = min(
+                    state.backoff * 2, self.max_backoff / max(self.min_delay, 0.001)
+                )
+                pause = min(max(self._retry_after(headers), self._delay(state)), self.max_backoff)
+                state.blocked_until = max(state.blocked_until, time.monotonic() + pause)
+                logger.warning(
+                    f"{get_domain(url)} answered {status}, pausing it for {round(pause, 1)} seconds"
+                )
+            elif status < 400:
+                state.backoff = max(1.0, state.backoff / 2)
+
+    @staticmethod
+    def _retry_after(headers):
+        """Seconds from a Retry-After header, given either as seconds or as a date"""
+        value = header_value(headers, "Retry-After")
+        if not value:
+            return 0.0
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0.0
+
+    def observe_response(self, response, *args, **kwargs):
+        """requests response hook feeding HTTP statuses into the backoff"""
+        self.record(response.url, response.status_code, response.headers)
+        return response
+
+    @staticmethod
+    def interleave(items, key=lambda item: item):
+        """Reorder items round-robin by host, so one host's URLs are not queued back to back"""
+        queues = {}
+        for item in items:
+            queues.setdefault(get_domain(key(item)), []).append(item)
+
+        result = []
+        queues = list(queues.values())
+        for position in range(max((len(queue) for queue in queues), default=0)):
+            result.extend(queue[position] for queue in queues if position < len(queue))
+        return result
+
+    def stats(self):
+        """Get the number of tracked hosts and those currently backing off"""
+        with self._condition:
+            now = time.monotonic()
+            return {
+                "enabled": self.enabled,
+                "hosts": len(self._hosts),
+                "active": sum(state.active for state in self._hosts.values()),
+                "backing_off": {
+                    host: round(state.blocked_until - now, 1)
+                    for host, state in self._hosts.items()
+                    if state.blocked_until > now
+                },
+            }
@@ -0,0 +1,233 @@
+import configparser
+import time
+from datetime import datetime
+from loguru import logger
+
+from browser_pool import BrowserPool
+from html_cleaner import HtmlCleaner, normalize_text
+from http_fetcher import HttpFetcher, get_domain, header_value
+from database import (
+    save_crawled_page,
+    get_crawled_page,
+    get_validators,
+    touch_crawled_page,
+    get_domain_fetch_mode,
+    record_fetch_outcome,
+)
+from task_executor import BoundedExecutor
+from crawl_scheduler import CrawlScheduler
+from single_flight import SingleFlight
+from metrics import FETCHES, FETCH_SECONDS, DB_SAVE_SECONDS
+from url_canonicalizer import canonicalize_url
+
+# Read configuration
+config = configparser.ConfigParser()
+config.read("config.ini")
+
+# Pool of browsers shared by every crawl entry point
+crawler = BrowserPool()
+
+# Plain HTTP tier tried before starting a browser
+http_fetcher = HttpFetcher()
+
+# Browser work is bounded by the number of pooled browsers, plain HTTP fetches
+# are cheap and get their own larger pool, parsing and database work run on a third
+crawl_executor = BoundedExecutor(
+    "crawl",
+    max_workers=crawler.size,
+    max_queue=config.getint("executor", "crawl_queue_size", fallback=20),
+)
+http_executor = BoundedExecutor(
+    "http",
+    max_workers=config.getint("executor", "http_workers", fallback=8),
+    max_queue=config.getint("executor", "http_queue_size", fallback=50),
+)
+work_executor = BoundedExecutor(
+    "work",
+    max_workers=config.getint("executor", "worker_threads", fallback=4),
+    max_queue=config.getint("executor", "work_queue_size", fallback=100),
+)
+
+# Politeness per host for both fetch tiers, HTTP statuses feed its backoff
+crawl_scheduler = CrawlScheduler(http_fetcher.session)
+http_fetcher.session.hooks["response"].append(crawl_scheduler.observe_response)
+
+# Crawls in progress, so concurrent requests for one URL share a single crawl
+crawl_flights = SingleFlight()
+
+
+def fetch_page(url, slot_held=False):
+    """Fetch a URL over plain HTTP when the domain allows it, otherwise with a browser
+
+    Pages stored before are revalidated first, an unchanged page comes back
+    with "not_modified" set instead of being fetched again. Unless the caller
+    already holds the host's politeness slot, waits for it and raises
+    HostThrottled when it is not given in time.
+    """
+    if slot_held:
+        return fetch_http(url) or fetch_browser(url)
+    with crawl_scheduler.slot(url):
+        return fetch_http(url) or fetch_browser(url)
+
+
+async def fetch_page_async(url):
+    """Fetch a URL from the event loop, only taking a browser worker when plain HTTP is not enough
+
+    The host's politeness slot is awaited before anything is submitted, so a
+    slow or throttled host never holds a worker that other hosts could use.
+    """
+    async with crawl_scheduler.async_slot(url):
+        crawled_data = await http_executor.run(fetch_http, url)
+        if not crawled_data:
+            crawled_data = await crawl_executor.run(fetch_browser, url)
+        return crawled_data
+
+
+def fetch_http(url):
+    """Try the plain HTTP tier, returns None when the page has to be crawled with a browser"""
+    if not http_fetcher.enabled:
+        return None
+
+    domain = get_domain(url)
+    validators = get_validators(url)
+    if get_domain_fetch_mode(domain) == "browser":
+        # Browser-only domains still answer a conditional HEAD without starting a browser
+        crawled_data = http_fetcher.head_not_modified(url, validators) if validators else None
+        if crawled_data:
+            FETCHES.inc(tier="http", outcome="not_modified")
+        return crawled_data
+
+    with FETCH_SECONDS.time(tier="http"):
+        crawled_data = http_fetcher.fetch(url, validators)
+    if not crawled_data:
+        # Network errors and non-2xx answers say nothing about whether the domain needs a browser
+        FETCHES.inc(tier="http", outcome="failed")
+        logger.info(f"Falling back to browser for {url}: HTTP fetch failed")
+        return None
+    if crawled_data.get("not_modified"):
+        FETCHES.inc(tier="http", outcome="not_modified")
+        return crawled_data
+
+    reason = http_fetcher.needs_browser(crawled_data)
+    record_fetch_outcome(domain, reason is None)
+
+    if reason is None:
+        FETCHES.inc(tier="http", outcome="ok")
+        logger.info(f"Fetched {url} without a browser")
+        return crawled_data
+    FETCHES.inc(tier="http", outcome="escalated")
+    logger.info(f"Escalating {url} to browser: {reason}")
+    return None
+
+
+def fetch_browser(url):
+    """Crawl a URL with a pooled browser"""
+    with FETCH_SECONDS.time(tier="browser"):
+        crawled_data = crawler.crawl_url(url)
+    FETCHES.inc(tier="browser", outcome="ok" if crawled_data else "failed")
+    if crawled_data:
+        # The browser's main document response tells whether the host is throttling us
+        document = (crawled_data.get("wait_timings") or {}).get("document") or {}
+        crawl_scheduler.record(url, document.get("status"), document.get("headers"))
+    return crawled_data
+
+
+def _response_headers(crawled_data):
+    """Headers of the page response, from the HTTP tier or the browser's main document"""
+    if crawled_data.get("headers"):
+        return crawled_data["headers"]
+    document = (crawled_data.get("wait_timings") or {}).get("document") or {}
+    return document.get("headers") or {}
+
+
+def process_and_save(crawled_data):
+    """Clean crawled HTML and store the result, returning the processed page"""
+    headers = _response_headers(crawled_data)
+    etag = header_value(headers, "ETag")
+    last_modified = header_value(headers, "Last-Modified")
+
+    # Unchanged pages only get their crawl date bumped, without cleaning them again
+    if crawled_data.get("not_modified"):
+        touch_crawled_page(crawled_data["url"], etag=etag, last_modified=last_modified)
+        page = get_crawled_page(crawled_data["url"])
+        if page:
+            logger.info(f"Revalidated {crawled_data['url']} without crawling it again")
+        return page
+
+    processed_data = HtmlCleaner.process_page(crawled_data)
+    if not processed_data:
+        return None
+
+    # Store under the URL the page declares as canonical when that is safe, reachable from the crawled one
+    with DB_SAVE_SECONDS.time():
+        processed_data["url"] = save_crawled_page(
+            url=processed_data["url"],
+            title=processed_data["title"],
+            description=processed_data["description"],
+            content=processed_data["content"],
+            html=processed_data["html"],
+            canonical=processed_data["canonical"],
+            etag=etag,
+            last_modified=last_modified,
+            source_hash=crawled_data.get("source_hash"),
+        )
+    return processed_data
+
+
+def crawled_since(url, since):
+    """The stored page when it was crawled at or after since, e.g. by a crawl that just finished"""
+    page = get_crawled_page(url)
+    if page and page.get("last_crawled_at"):
+        if datetime.fromisoformat(page["last_crawled_at"]) >= since:
+            return page
+    return None
+
+
+def _crawl_and_store(url, since, slot_held):
+    # Another crawl of the URL may have finished between the caller's check and this one starting
+    page = crawled_since(url, since)
+    if page:
+        logger.info(f"{url} was crawled while waiting, not crawling it again")
+        return page
+
+    crawled_data = fetch_page(url, slot_held=slot_held)
+    if not crawled_data:
+        logger.error(f"Failed to crawl URL: {url}")
+        return None
+    return process_and_save(crawled_data)
+
+
+def crawl_and_store(url, since=None, slot_held=False):
+    """Crawl, process and save a URL synchronously, for use from worker threads
+
+    A page stored at or after since (default: now) is returned as is, so a
+    caller that decided to crawl before another crawl finished does not repeat it.
+    Callers that took the host's slot with try_acquire pass slot_held.
+    """
+    return crawl_flights.do(
+        canonicalize_url(url), _crawl_and_store, url, since or datetime.now(), slot_held
+    )
+
+
+def prewarm(browsers=0, cleaner=True):
+    """Load the HTML cleaner and start browsers ahead of the first crawl"""
+    if cleaner:
+        started = time.perf_counter()
+        HtmlCleaner.parse("<html></html>")
+        normalize_text("")
+        logger.info(f"Startup: HTML cleaner loaded in {time.perf_counter() - started:.3f}s")
+
+    if browsers:
+        started = time.perf_counter()
+        count = crawler.prewarm(browsers)
+        logger.info(
+            f"Startup: {count} browsers started in {time.perf_counter() - started:.3f}s"
+        )
+
+
+def shutdown():
+    """Close browsers and stop executors"""
+    crawler.close_all()
+    crawl_executor.shutdown()
+    http_executor.shutdown()
+    work_executor.shutdown()
@@ -1,25 +1,192 @@
 import os
+import re
+import json
+import uuid
+import base64
+import queue
+import functools
+import threading
 import configparser
 import sqlite3
-from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from markupsafe import escape
+from loguru import logger
+from sqlalchemy import (
+    create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Float, Index,
+    LargeBinary, func, or_, text, tuple_, select, update, cast, inspect, event,
+)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, load_only, deferred
+
+import html_store
+from page_cache import PageCache
+from url_canonicalizer import canonicalize_url, resolve_canonical
+from metrics import RECRAWL_CHECKS
 
 # Read configuration
 config = configparser.ConfigParser()
 config.read('config.ini')
 
+# Days before a crawled page is considered stale, read once
+SKIP_CRAWL_DAYS = config.getint('crawler', 'skip_crawl_time', fallback=60)
+
 # Create data directory if it doesn't exist
 data_folder = config.get('storage', 'save_folder', fallback='data')
 os.makedirs(data_folder, exist_ok=True)
 
 # Database setup
 database_path = config.get('storage', 'database_path', fallback='data/crawled_data.db')
-engine = create_engine(f'sqlite:///{database_path}')
+busy_timeout = config.getint('database', 'busy_timeout', fallback=5000)
+engine = create_engine(
+    f'sqlite:///{database_path}',
+    connect_args={'check_same_thread': False, 'timeout': busy_timeout / 1000},
+    pool_size=config.getint('database', 'pool_size', fallback=10),
+    max_overflow=config.getint('database', 'max_overflow', fallback=10),
+    pool_timeout=config.getint('database', 'pool_timeout', fallback=30),
+)
 Base = declarative_base()
 Session = sessionmaker(bind=engine)
 
+# Pragmas applied to every new connection
+PRAGMAS = {
+    'journal_mode': config.get('database', 'journal_mode', fallback='WAL'),
+    'synchronous': config.get('database', 'synchronous', fallback='NORMAL'),
+    'cache_size': config.getint('database', 'cache_size', fallback=-65536),
+    'mmap_size': config.getint('database', 'mmap_size', fallback=268435456),
+    'temp_store': config.get('database', 'temp_store', fallback='MEMORY'),
+    'busy_timeout': busy_timeout,
+}
+
+
+@event.listens_for(engine, 'connect')
+def _apply_pragmas(dbapi_connection, connection_record):
+    """Tune each SQLite connection as it is opened"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+class WriteQueue:
+    """Runs database writes one at a time on a dedicated thread, so writers never fight over the lock"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name='db-writer', daemon=True)
+                self._thread.start()
+
+    def _worker(self):
+        while True:
+            future, fn, args, kwargs = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def run(self, fn, *args, **kwargs):
+        """Run a write function on the writer thread and wait for its result"""
+        if not self.enabled or threading.current_thread() is self._thread:
+            return fn(*args, **kwargs)
+
+        self._start()
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future.result()
+
+    def depth(self):
+        """Number of writes waiting for the writer thread"""
+        return self._queue.qsize()
+
+
+write_queue = WriteQueue(config.getboolean('database', 'single_writer', fallback=True))
+
+
+def serialized_write(fn):
+    """Decorator routing a write function through the single writer queue"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return write_queue.run(fn, *args, **kwargs)
+    return wrapper
+
+
+# Fresh pages kept in memory in front of lookup_page, entries expire when the page goes stale
+page_cache = PageCache(
+    max_entries=config.getint('cache', 'max_entries', fallback=1000),
+    max_bytes=config.getint('cache', 'max_bytes', fallback=64 * 1024 * 1024),
+    ttl=config.getint('cache', 'ttl', fallback=3600),
+) if config.getboolean('cache', 'enabled', fallback=True) else None
+
+
+
+class AccessCounter:
+    """Counts page reads in memory, so reads never write to the database themselves"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, page_id):
+        """Count one read of a page"""
+        with self._lock:
+            self._counts[page_id] = self._counts.get(page_id, 0) + 1
+
+    def take(self):
+        """Return the counts gathered so far and start over"""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            return counts
+
+
+access_counter = AccessCounter()
+
+# Stay well below SQLite's limit on bound variables per statement
+SQLITE_MAX_VARIABLES = 900
+
+# Set by init_db once the full-text index is known to be available
+fts_enabled = False
+
+# Full-text index over crawled pages, kept in sync with crawled_pages by triggers
+FTS_TABLE = 'crawled_pages_fts'
+FTS_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, content, url,
+        content='crawled_pages', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS crawled_pages_fts_insert AFTER INSERT ON crawled_pages BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description, content, url)
+        VALUES (new.id, new.title, new.description, new.content, new.url);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS crawled_pages_fts_delete AFTER DELETE ON crawled_pages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, content, url)
+        VALUES ('delete', old.id, old.title, old.description, old.content, old.url);
+    END""",
+    # Only indexed columns fire this, so bumping last_crawled_at does not rewrite the index
+    f"""CREATE TRIGGER IF NOT EXISTS crawled_pages_fts_update
+    AFTER UPDATE OF title, description, content, url ON crawled_pages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, content, url)
+        VALUES ('delete', old.id, old.title, old.description, old.content, old.url);
+        INSERT INTO {FTS_TABLE}(rowid, title, description, content, url)
+        VALUES (new.id, new.title, new.description, new.content, new.url);
+    END""",
+]
+
+# Markers placed around matches by snippet(), replaced by <mark> after escaping
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
 
 class CrawledPage(Base):
     """Model for storing crawled web pages"""
@@ -27,60 +194,347 @@ class CrawledPage(Base):
 
     id = Column(Integer, primary_key=True)
     url = Column(String, unique=True, index=True)
+    # URL exactly as it was last fetched, canonical URLs may not be served as is
+    fetch_url = Column(String)
     title = Column(String)
     description = Column(String)
     content = Column(Text)
-    html = Column(Text)
+    # Legacy inline HTML, moved into html_blobs by migrate_inline_html
+    html = deferred(Column(Text))
+    html_hash = Column(String(64), index=True)
+    # Validators for cheap revalidation: HTTP caching headers and the hash of the raw response body
+    etag = Column(String)
+    last_modified = Column(String)
+    source_hash = Column(String(64))
     last_crawled_at = Column(DateTime, default=datetime.now)
+    # How often the page is read, so the refresher renews popular pages first
+    access_count = Column(Integer, default=0)
+    last_accessed_at = Column(DateTime)
+
+    # Serves newest-first listings and keyset pagination
+    __table_args__ = (
+        Index('ix_crawled_pages_last_crawled_at_id', 'last_crawled_at', 'id'),
+    )
+
+    # Fields that can be returned by to_dict, html is never part of API output
+    FIELDS = ('id', 'url', 'title', 'description', 'content', 'last_crawled_at')
+
+    def to_dict(self, fields=None):
+        """Convert model to dictionary, optionally only some fields"""
+        result = {field: getattr(self, field) for field in (fields or self.FIELDS)}
+        if result.get("last_crawled_at"):
+            result["last_crawled_at"] = result["last_crawled_at"].isoformat()
+        return result
+
+
+class UrlAlias(Base):
+    """Model mapping a URL variant to the canonical URL of its crawled page"""
+    __tablename__ = 'url_aliases'
+
+    alias = Column(String, primary_key=True)
+    url = Column(String, index=True)
+    created_at = Column(DateTime, default=datetime.now)
+
+
+class HtmlBlob(Base):
+    """Model for compressed raw HTML, shared by every page with identical HTML"""
+    __tablename__ = 'html_blobs'
+
+    hash = Column(String(64), primary_key=True)
+    codec = Column(String(8))
+    size = Column(Integer)
+    # Empty when the blob is stored on disk under save_folder/html
+    data = deferred(Column(LargeBinary))
+    created_at = Column(DateTime, default=datetime.now)
+
+
+class CrawlJob(Base):
+    """Model for a batch crawl job"""
+    __tablename__ = 'crawl_jobs'
+
+    id = Column(String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    status = Column(String, default='pending', index=True)
+    total = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.now)
+    finished_at = Column(DateTime)
+
+    def to_dict(self):
+        """Convert model to dictionary"""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class CrawlJobItem(Base):
+    """Model for the state of a single URL inside a batch crawl job"""
+    __tablename__ = 'crawl_job_items'
+
+    # States an item can end in
+    FINISHED_STATES = ('done', 'cached', 'failed')
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(32), ForeignKey('crawl_jobs.id'), index=True)
+    position = Column(Integer)
+    url = Column(String)
+    state = Column(String, default='pending', index=True)
+    message = Column(String)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
     def to_dict(self):
         """Convert model to dictionary"""
         return {
             "id": self.id,
             "url": self.url,
-            "title": self.title,
-            "description": self.description,
-            "content": self.content,
-            "last_crawled_at": self.last_crawled_at.isoformat()
+            "state": self.state,
+            "message": self.message,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
 
 
-def init_db():
-    """Initialize database and tables"""
+class DomainFetchMode(Base):
+    """Model for the learned fetch tier of a domain"""
+    __tablename__ = 'domain_fetch_modes'
+
+    domain = Column(String, primary_key=True)
+    mode = Column(String, default='http')
+    http_successes = Column(Integer, default=0)
+    escalations = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+def init_db(migrate_html=True):
+    """Initialize database and tables, moving legacy inline HTML in the background"""
+    global fts_enabled
+    # Stored URLs are rewritten into canonical form once, when aliases are first introduced
+    canonicalize_urls = not inspect(engine).has_table(UrlAlias.__tablename__)
     Base.metadata.create_all(engine)
 
+    # create_all skips existing tables, so add columns and indexes introduced later separately
+    _add_missing_columns()
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+    fts_enabled = _init_fts()
+
+    if canonicalize_urls:
+        canonicalize_stored_urls()
+
+    if migrate_html:
+        start_html_migration()
+
+
+def _add_missing_columns():
+    """Add columns that were added to a model after its table was created"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                    logger.info(f"Added column {table.name}.{column.name}")
+
+
+def _init_fts():
+    """Create the full-text index and its triggers, filling it on first creation"""
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE},
+            ).first()
+            for statement in FTS_SCHEMA:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        return True
+    except Exception as e:
+        # SQLite builds without FTS5 fall back to LIKE searches
+        logger.warning(f"Full-text search unavailable: {str(e)}")
+        return False
+
 
 def get_session():
     """Get database session"""
     return Session()
 
 
-def save_crawled_page(url, title, description, content, html):
-    """Save crawled page to database"""
+def store_html(session, html):
+    """Store HTML as a compressed, deduplicated blob and return its hash"""
+    if not html:
+        return None
+
+    html_hash = html_store.content_hash(html)
+    if session.get(HtmlBlob, html_hash) is None:
+        codec, data = html_store.compress(html)
+        if html_store.BACKEND == 'disk':
+            html_store.write_blob_file(html_hash, codec, data)
+            data = None
+        session.add(HtmlBlob(hash=html_hash, codec=codec, size=len(html), data=data))
+        session.flush()
+    return html_hash
+
+
+def _page_url(url):
+    """SQL expression for the stored URL of a page, following the alias of its canonical form"""
+    key = canonicalize_url(url)
+    alias = select(UrlAlias.url).where(UrlAlias.alias == key).scalar_subquery()
+    return func.coalesce(alias, key)
+
+
+def _add_alias(session, alias, url):
+    """Point an alias at a canonical URL"""
+    if alias == url:
+        return
+    # Aliases of the alias follow it to the new canonical URL
+    session.query(UrlAlias).filter_by(url=alias).update(
+        {"url": url}, synchronize_session=False
+    )
+    session.merge(UrlAlias(alias=alias, url=url))
+
+
+def _merge_alias_page(session, alias, page):
+    """Fold a page stored under an alias URL into its canonical page, keeping its reads"""
+    duplicate = session.query(CrawledPage).filter_by(url=alias).first()
+    if duplicate is None:
+        return
+    page.access_count = (page.access_count or 0) + (duplicate.access_count or 0)
+    if duplicate.last_accessed_at and (
+        page.last_accessed_at is None or duplicate.last_accessed_at > page.last_accessed_at
+    ):
+        page.last_accessed_at = duplicate.last_accessed_at
+    session.delete(duplicate)
+
+
+def _holds_other_page(session, canonical, requested, html_hash):
+    """Check whether a canonical URL already stores a different page than the one fetched from requested"""
+    stored_hash = session.execute(
+        select(CrawledPage.html_hash).where(CrawledPage.url == canonical)
+    ).first()
+    if stored_hash is None or stored_hash[0] == html_hash:
+        return False
+    # A URL that already resolved to the canonical one is simply a newer version of it
+    alias = session.get(UrlAlias, requested)
+    return not (alias and alias.url == canonical)
+
+
+@serialized_write
+def save_crawled_page(
+    url, title, description, content, html, canonical=None,
+    etag=None, last_modified=None, source_hash=None,
+):
+    """Save a page fetched from url and return the canonical URL it was stored under
+
+    The <link rel=canonical> href the page declares is followed as long as no
+    different page is stored there; url is then recorded as an alias of it, and
+    a row stored under url before, an older copy of this page, is merged into it.
+    """
+    fetch_url = url.strip()
+    requested = canonicalize_url(url)
     session = get_session()
     try:
+        html_hash = store_html(session, html)
+        url = resolve_canonical(
+            requested,
+            canonical,
+            lambda target: _holds_other_page(session, target, requested, html_hash),
+        )
+
+        # A page stored under this URL means it is no longer an alias of another one
+        session.query(UrlAlias).filter_by(alias=url).delete(synchronize_session=False)
+        _add_alias(session, requested, url)
+
         # Check if page already exists
         existing = session.query(CrawledPage).filter_by(url=url).first()
         
         if existing:
             # Update existing record
+            existing.fetch_url = fetch_url
             existing.title = title
             existing.description = description
             existing.content = content
-            existing.html = html
+            existing.html = None
+            existing.html_hash = html_hash
+            existing.etag = etag
+            existing.last_modified = last_modified
+            existing.source_hash = source_hash
             existing.last_crawled_at = datetime.now()
         else:
             # Create new record
             page = CrawledPage(
                 url=url,
+                fetch_url=fetch_url,
                 title=title,
                 description=description,
                 content=content,
-                html=html
+                html_hash=html_hash,
+                etag=etag,
+                last_modified=last_modified,
+                source_hash=source_hash,
             )
             session.add(page)
-        
+
+        if url != requested:
+            _merge_alias_page(session, requested, existing or page)
+
+        session.commit()
+        _invalidate_cached(session, url)
+        return url
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+
+def _invalidate_cached(session, url):
+    """Drop a page and every alias of it from the page cache"""
+    if page_cache:
+        page_cache.invalidate(url)
+        for alias in session.execute(select(UrlAlias.alias).where(UrlAlias.url == url)).scalars():
+            page_cache.invalidate(alias)
+
+
+def get_validators(url):
+    """Get the stored ETag, Last-Modified and source hash of a page, or None if it is not stored"""
+    session = get_session()
+    try:
+        row = session.execute(
+            select(CrawledPage.etag, CrawledPage.last_modified, CrawledPage.source_hash)
+            .where(CrawledPage.url == _page_url(url))
+        ).first()
+        return dict(row._mapping) if row else None
+    finally:
+        session.close()
+
+
+@serialized_write
+def touch_crawled_page(url, etag=None, last_modified=None):
+    """Mark a page that has not changed as freshly crawled, keeping its content"""
+    session = get_session()
+    try:
+        page = (
+            session.query(CrawledPage)
+            .options(load_only(CrawledPage.id, CrawledPage.url))
+            .filter(CrawledPage.url == _page_url(url))
+            .first()
+        )
+        if not page:
+            return False
+
+        page.last_crawled_at = datetime.now()
+        if etag:
+            page.etag = etag
+        if last_modified:
+            page.last_modified = last_modified
         session.commit()
+        _invalidate_cached(session, page.url)
         return True
     except Exception as e:
         session.rollback()
@@ -91,30 +545,670 @@ def save_crawled_page(url, title, description, content, html):
 
 def get_crawled_page(url):
     """Get crawled page from database"""
+    page, _ = lookup_page(url)
+    return page
+
+
+def _is_stale(last_crawled_at, skip_days):
+    """Check if a crawl date is older than skip_days"""
+    return last_crawled_at is None or (datetime.now() - last_crawled_at).days >= skip_days
+
+
+def _count_check(found, stale, source):
+    """Count a freshness check by its outcome and where it was answered from"""
+    result = "missing" if not found else "stale" if stale else "fresh"
+    RECRAWL_CHECKS.inc(result=result, source=source)
+
+
+def lookup_page(url, skip_days=None):
+    """Get a crawled page and whether it is stale, in one query that never reads html"""
+    if skip_days is None:
+        skip_days = SKIP_CRAWL_DAYS
+
+    key = canonicalize_url(url)
+    cached = page_cache.get(key) if page_cache else None
+    if cached:
+        page, last_crawled_at = cached
+        access_counter.record(page["id"])
+        stale = _is_stale(last_crawled_at, skip_days)
+        _count_check(True, stale, "cache")
+        return dict(page), stale
+
+    # Taken before reading, so a write that lands in between keeps the result out of the cache
+    generation = page_cache.generation(key) if page_cache else None
     session = get_session()
     try:
-        page = session.query(CrawledPage).filter_by(url=url).first()
-        return page.to_dict() if page else None
+        page = (
+            project_fields(session.query(CrawledPage), CrawledPage.FIELDS)
+            .filter(CrawledPage.url == _page_url(key))
+            .first()
+        )
+        if not page:
+            _count_check(False, True, "database")
+            return None, True
+        result = page.to_dict()
+        last_crawled_at = page.last_crawled_at
     finally:
         session.close()
 
+    access_counter.record(result["id"])
+
+    # Cache the page until it would go stale
+    if page_cache and last_crawled_at:
+        fresh_for = last_crawled_at + timedelta(days=SKIP_CRAWL_DAYS) - datetime.now()
+        page_cache.put(
+            key, (result, last_crawled_at), ttl=fresh_for.total_seconds(), generation=generation
+        )
+    stale = _is_stale(last_crawled_at, skip_days)
+    _count_check(True, stale, "database")
+    return dict(result), stale
+
 
 def should_recrawl(url, skip_days=None):
     """Check if page should be recrawled based on last crawl date"""
     if skip_days is None:
-        config = configparser.ConfigParser()
-        config.read('config.ini')
-        skip_days = config.getint('crawler', 'skip_crawl_time', fallback=60)
-    
+        skip_days = SKIP_CRAWL_DAYS
+
+    key = canonicalize_url(url)
+    cached = page_cache.get(key) if page_cache else None
+    if cached:
+        stale = _is_stale(cached[1], skip_days)
+        _count_check(True, stale, "cache")
+        return stale
+
+    session = get_session()
+    try:
+        last_crawled_at = session.execute(
+            select(CrawledPage.last_crawled_at).where(CrawledPage.url == _page_url(key))
+        ).scalar()
+        # Missing pages and pages crawled more than skip_days ago are recrawled
+        stale = _is_stale(last_crawled_at, skip_days)
+        _count_check(last_crawled_at is not None, stale, "database")
+        return stale
+    finally:
+        session.close()
+
+
+@serialized_write
+def flush_access_counts():
+    """Write the page reads counted in memory, returns the number of pages updated"""
+    counts = access_counter.take()
+    if not counts:
+        return 0
+
     session = get_session()
     try:
-        page = session.query(CrawledPage).filter_by(url=url).first()
-        if not page:
-            return True
-        
-        # Check if page was crawled more than skip_days ago
         now = datetime.now()
-        delta = now - page.last_crawled_at
-        return delta.days >= skip_days
+        for page_id, count in counts.items():
+            session.query(CrawledPage).filter_by(id=page_id).update(
+                {
+                    "access_count": func.coalesce(CrawledPage.access_count, 0) + count,
+                    "last_accessed_at": now,
+                },
+                synchronize_session=False,
+            )
+        session.commit()
+        return len(counts)
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+
+@serialized_write
+def decay_access_counts(factor):
+    """Scale every access count down by factor, so old reads weigh less than recent ones"""
+    session = get_session()
+    try:
+        updated = session.execute(
+            update(CrawledPage)
+            .where(CrawledPage.access_count > 0)
+            .values(access_count=cast(CrawledPage.access_count * factor, Integer))
+        ).rowcount
+        session.commit()
+        return updated
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+
+def get_pages_due(crawled_before, limit):
+    """Get (fetch URL, access count) of pages crawled before a date, most read first
+
+    Only pages read since they were last crawled qualify, nobody waits for the others.
+    """
+    session = get_session()
+    try:
+        return session.execute(
+            select(
+                func.coalesce(CrawledPage.fetch_url, CrawledPage.url),
+                func.coalesce(CrawledPage.access_count, 0),
+            )
+            .where(CrawledPage.last_crawled_at <= crawled_before)
+            .where(CrawledPage.access_count > 0)
+            .where(CrawledPage.last_accessed_at > CrawledPage.last_crawled_at)
+            .order_by(
+                func.coalesce(CrawledPage.access_count, 0).desc(),
+                CrawledPage.last_crawled_at,
+            )
+            .limit(limit)
+        ).all()
+    finally:
+        session.close()
+
+
+@serialized_write
+def create_crawl_job(urls):
+    """Create a batch crawl job with one pending item per URL and return its id"""
+    session = get_session()
+    try:
+        job = CrawlJob(status='running', total=len(urls))
+        session.add(job)
+        session.flush()
+        session.add_all([
+            CrawlJobItem(job_id=job.id, position=position, url=url)
+            for position, url in enumerate(urls)
+        ])
+        session.commit()
+        return job.id
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+
+def get_job_items(job_id, states=None):
+    """Get (item id, url) pairs for a job, optionally limited to some states"""
+    session = get_session()
+    try:
+        query = session.query(CrawlJobItem.id, CrawlJobItem.url).filter_by(job_id=job_id)
+        if states:
+            query = query.filter(CrawlJobItem.state.in_(states))
+        return query.order_by(CrawlJobItem.position).all()
+    finally:
+        session.close()
+
+
+@serialized_write
+def update_job_item(item_id, state, message=None):
+    """Update the state of a job item and finish the job once every item is done"""
+    session = get_session()
+    try:
+        item = session.get(CrawlJobItem, item_id)
+        if not item:
+            return False
+
+        item.state = state
+        item.message = message
+
+        if state in CrawlJobItem.FINISHED_STATES:
+            session.flush()
+            remaining = (
+                session.query(func.count(CrawlJobItem.id))
+                .filter(CrawlJobItem.job_id == item.job_id)
+                .filter(CrawlJobItem.state.notin_(CrawlJobItem.FINISHED_STATES))
+                .scalar()
+            )
+            if remaining == 0:
+                job = session.get(CrawlJob, item.job_id)
+                job.status = 'completed'
+                job.finished_at = datetime.now()
+
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+
+def get_crawl_job(job_id, include_items=True):
+    """Get a batch crawl job with per-state counts and optionally its items"""
+    session = get_session()
+    try:
+        job = session.get(CrawlJob, job_id)
+        if not job:
+            return None
+
+        result = job.to_dict()
+        counts = dict(
+            session.query(CrawlJobItem.state, func.count(CrawlJobItem.id))
+            .filter(CrawlJobItem.job_id == job_id)
+            .group_by(CrawlJobItem.state)
+            .all()
+        )
+        result["counts"] = counts
+        result["finished"] = sum(counts.get(state, 0) for state in CrawlJobItem.FINISHED_STATES)
+
+        if include_items:
+            items = (
+                session.query(CrawlJobItem)
+                .filter_by(job_id=job_id)
+                .order_by(CrawlJobItem.position)
+                .all()
+            )
+            result["items"] = [item.to_dict() for item in items]
+        return result
+    finally:
+        session.close()
+
+
+def get_unfinished_job_ids():
+    """Get ids of jobs that were still running, e.g. when the server stopped"""
+    session = get_session()
+    try:
+        return [job_id for (job_id,) in session.query(CrawlJob.id).filter_by(status='running')]
+    finally:
+        session.close()
+
+
+def get_domain_fetch_mode(domain, relearn_days=None):
+    """Get the learned fetch mode ('http' or 'browser') for a domain, or None if unknown"""
+    if relearn_days is None:
+        relearn_days = config.getint('fetcher', 'relearn_days', fallback=7)
+
+    session = get_session()
+    try:
+        entry = session.get(DomainFetchMode, domain)
+        if not entry:
+            return None
+
+        # Give domains that needed a browser another chance with plain HTTP now and then
+        if entry.mode == 'browser' and (datetime.now() - entry.updated_at).days >= relearn_days:
+            return None
+        return entry.mode
+    finally:
+        session.close()
+
+
+@serialized_write
+def record_fetch_outcome(domain, http_ok, escalate_after=None):
+    """Record whether plain HTTP was enough for a domain and update its learned mode"""
+    if escalate_after is None:
+        escalate_after = config.getint('fetcher', 'escalate_after', fallback=2)
+
+    session = get_session()
+    try:
+        entry = session.get(DomainFetchMode, domain)
+        if not entry:
+            entry = DomainFetchMode(domain=domain, http_successes=0, escalations=0)
+            session.add(entry)
+
+        if http_ok:
+            entry.http_successes += 1
+            entry.escalations = 0
+        else:
+            entry.escalations += 1
+
+        entry.mode = 'browser' if entry.escalations >= escalate_after else 'http'
+        entry.updated_at = datetime.now()
+        session.commit()
+        return entry.mode
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+
+def build_fts_query(q):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix"""
+    terms = re.findall(r'(\w+)(\*?)', q or '', re.UNICODE)
+    parts = []
+    for index, (word, star) in enumerate(terms):
+        prefix = star or index == len(terms) - 1
+        parts.append(f'"{word}"*' if prefix else f'"{word}"')
+    return ' '.join(parts)
+
+
+def highlight_snippet(snippet):
+    """Escape a search snippet and wrap the matched words in <mark>"""
+    if not snippet:
+        return None
+    return str(escape(snippet)).replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+
+
+def _fts_match_ids(match, columns='rowid AS id'):
+    """SQL selecting rows of the full-text index that match an FTS5 query"""
+    return text(f"SELECT {columns} FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match").bindparams(
+        match=match
+    )
+
+
+def apply_search(query, q, ranked=True):
+    """Restrict a CrawledPage query to pages matching q, best matches first
+
+    With ranked=False only the match filter is applied, which is what counting
+    needs: ranking and snippets are left for the rows actually returned.
+    """
+    match = build_fts_query(q)
+    if not match:
+        return query
+
+    if not fts_enabled:
+        pattern = f"%{q}%"
+        query = query.filter(
+            or_(
+                CrawledPage.title.ilike(pattern),
+                CrawledPage.url.ilike(pattern),
+                CrawledPage.description.ilike(pattern),
+            )
+        )
+        return query.order_by(CrawledPage.last_crawled_at.desc()) if ranked else query
+
+    if not ranked:
+        return query.filter(CrawledPage.id.in_(_fts_match_ids(match).columns(id=Integer)))
+
+    # Title matches weigh most, then url, description and content
+    fts = (
+        _fts_match_ids(match, f'rowid AS id, bm25({FTS_TABLE}, 10.0, 3.0, 1.0, 5.0) AS rank')
+        .columns(id=Integer, rank=Float)
+        .subquery('fts')
+    )
+    return query.join(fts, fts.c.id == CrawledPage.id).order_by(fts.c.rank)
+
+
+def search_snippets(q, page_ids):
+    """Highlighted content snippets of the given pages for a search, keyed by page id"""
+    match = build_fts_query(q)
+    if not match or not fts_enabled or not page_ids:
+        return {}
+
+    session = get_session()
+    try:
+        rows = session.execute(
+            text(
+                f"SELECT rowid, snippet({FTS_TABLE}, 2, :start, :end, '…', 24) "
+                f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match "
+                f"AND rowid IN ({', '.join(str(int(page_id)) for page_id in page_ids)})"
+            ),
+            {"match": match, "start": SNIPPET_START, "end": SNIPPET_END},
+        )
+        return {page_id: highlight_snippet(snippet) for page_id, snippet in rows}
     finally:
         session.close()
+
+
+def parse_fields(fields):
+    """Parse a comma separated field list, always keeping the keyset columns"""
+    if not fields:
+        return list(CrawledPage.FIELDS)
+
+    requested = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in CrawledPage.FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    return [field for field in CrawledPage.FIELDS if field in requested or field in ('id', 'last_crawled_at')]
+
+
+def project_fields(query, fields):
+    """Load only the given CrawledPage columns, leaving heavy ones out at the SQL level"""
+    return query.options(load_only(*[getattr(CrawledPage, field) for field in fields]))
+
+
+def encode_cursor(position):
+    """Encode a pagination position as an opaque URL-safe string"""
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor created by encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def keyset_paginate(query, cursor, limit):
+    """Page through CrawledPage rows newest first using (last_crawled_at, id) as the key"""
+    query = query.order_by(CrawledPage.last_crawled_at.desc(), CrawledPage.id.desc())
+
+    if cursor:
+        position = decode_cursor(cursor)
+        try:
+            key = (datetime.fromisoformat(position['t']), int(position['id']))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+        query = query.filter(tuple_(CrawledPage.last_crawled_at, CrawledPage.id) < key)
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor({'t': last.last_crawled_at.isoformat(), 'id': last.id})
+    return rows[:limit], next_cursor
+
+
+def offset_paginate(query, cursor, limit):
+    """Page through an already ordered query, e.g. search results ranked by relevance"""
+    offset = 0
+    if cursor:
+        try:
+            offset = int(decode_cursor(cursor)['o'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+
+    rows = query.offset(offset).limit(limit + 1).all()
+    next_cursor = encode_cursor({'o': offset + limit}) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def iter_pages(fields, since=None, after_id=None, until=None, url=None, batch_size=1000):
+    """Stream pages oldest first as dictionaries without loading the whole result set"""
+    columns = [getattr(CrawledPage, field) for field in fields]
+    query = select(*columns).order_by(CrawledPage.last_crawled_at, CrawledPage.id)
+
+    # Resume strictly after the last exported row, or from a date
+    if since and after_id is not None:
+        query = query.where(tuple_(CrawledPage.last_crawled_at, CrawledPage.id) > (since, after_id))
+    elif since:
+        query = query.where(CrawledPage.last_crawled_at >= since)
+    if until:
+        query = query.where(CrawledPage.last_crawled_at < until)
+    if url:
+        query = query.where(CrawledPage.url.ilike(f"%{url}%"))
+
+    session = get_session()
+    try:
+        result = session.execute(query.execution_options(yield_per=batch_size))
+        for row in result:
+            page = dict(zip(fields, row))
+            if page.get("last_crawled_at"):
+                page["last_crawled_at"] = page["last_crawled_at"].isoformat()
+            yield page
+    finally:
+        session.close()
+
+
+def iter_pages_by_ids(ids, fields, chunk_size=SQLITE_MAX_VARIABLES):
+    """Yield pages for the given ids in request order, one IN query per chunk"""
+    columns = [CrawledPage.id] + [getattr(CrawledPage, field) for field in fields]
+    session = get_session()
+    try:
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            rows = session.execute(select(*columns).where(CrawledPage.id.in_(set(chunk))))
+            by_id = {row[0]: dict(zip(fields, row[1:])) for row in rows}
+            for page_id in chunk:
+                if page_id in by_id:
+                    yield by_id[page_id]
+    finally:
+        session.close()
+
+
+@serialized_write
+def _migrate_inline_batch(batch_size):
+    """Move the HTML of one batch of pages into compressed blobs, returns pages migrated"""
+    session = get_session()
+    try:
+        rows = session.execute(
+            select(CrawledPage.id, CrawledPage.html)
+            .where(CrawledPage.html.isnot(None))
+            .limit(batch_size)
+        ).all()
+        for page_id, html in rows:
+            session.query(CrawledPage).filter_by(id=page_id).update(
+                {"html_hash": store_html(session, html), "html": None},
+                synchronize_session=False,
+            )
+        session.commit()
+        return len(rows)
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+
+def migrate_inline_html(batch_size=200):
+    """Move HTML stored inline in crawled_pages into compressed blobs, returns pages migrated
+
+    Every batch is its own short write, so crawls keep being saved in between.
+    """
+    migrated = 0
+    while True:
+        count = _migrate_inline_batch(batch_size)
+        if not count:
+            break
+        migrated += count
+        logger.info(f"Moved HTML of {migrated} pages into compressed storage")
+    return migrated
+
+
+_html_migration = None
+_html_migration_lock = threading.Lock()
+
+
+def start_html_migration():
+    """Move legacy inline HTML on a background thread, once per process"""
+    global _html_migration
+
+    def run():
+        try:
+            if migrate_inline_html():
+                # VACUUM locks the whole database for a long time, so it is left to the operator
+                logger.info(
+                    "Inline HTML migrated, run 'python html_store.py prune --vacuum' "
+                    "to release the freed space"
+                )
+        except Exception as e:
+            logger.error(f"Error migrating inline HTML: {str(e)}")
+
+    with _html_migration_lock:
+        if _html_migration is None:
+            _html_migration = threading.Thread(target=run, name='html-migration', daemon=True)
+            _html_migration.start()
+    return _html_migration
+
+
+@serialized_write
+def canonicalize_stored_urls(batch_size=500):
+    """Rewrite stored page URLs into canonical form, keeping the newest page of duplicates
+
+    Pages stored under an alias of another stored page are merged into that page.
+    """
+    rewritten = 0
+    last_id = 0
+    while True:
+        session = get_session()
+        try:
+            rows = session.execute(
+                select(CrawledPage.id, CrawledPage.url)
+                .where(CrawledPage.id > last_id)
+                .order_by(CrawledPage.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            for page_id, url in rows:
+                canonical = canonicalize_url(url)
+                if canonical == url:
+                    continue
+
+                page = session.get(CrawledPage, page_id)
+                existing = session.query(CrawledPage).filter_by(url=canonical).first()
+                if existing and (existing.last_crawled_at or datetime.min) >= (
+                    page.last_crawled_at or datetime.min
+                ):
+                    session.delete(page)
+                else:
+                    if existing:
+                        session.delete(existing)
+                        session.flush()
+                    page.fetch_url = page.fetch_url or url
+                    page.url = canonical
+                session.flush()
+                rewritten += 1
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+
+    # Pages still stored under a URL that became an alias of another page are older copies of it
+    session = get_session()
+    try:
+        aliased = session.execute(
+            select(UrlAlias.alias, UrlAlias.url).join(CrawledPage, CrawledPage.url == UrlAlias.alias)
+        ).all()
+        for alias, url in aliased:
+            page = session.query(CrawledPage).filter_by(url=url).first()
+            if page is not None:
+                _merge_alias_page(session, alias, page)
+                rewritten += 1
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+    if page_cache:
+        page_cache.clear()
+    if rewritten:
+        logger.info(f"Rewrote {rewritten} page URLs into canonical form")
+    return rewritten
+
+
+@serialized_write
+def prune_html_blobs():
+    """Delete blobs no page refers to anymore, returns the number deleted"""
+    session = get_session()
+    try:
+        orphans = session.execute(
+            select(HtmlBlob.hash, HtmlBlob.codec).where(
+                ~HtmlBlob.hash.in_(
+                    select(CrawledPage.html_hash).where(CrawledPage.html_hash.isnot(None))
+                )
+            )
+        ).all()
+        for html_hash, codec in orphans:
+            path = html_store.blob_path(html_hash, codec)
+            if os.path.exists(path):
+                os.remove(path)
+            session.query(HtmlBlob).filter_by(hash=html_hash).delete(synchronize_session=False)
+        session.commit()
+        logger.info(f"Deleted {len(orphans)} unused HTML blobs")
+        return len(orphans)
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+
+def vacuum():
+    """Rebuild the database file to release space freed by migrations"""
+    logger.info("Compacting database file...")
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text('VACUUM'))
@@ -1,71 +1,232 @@
 import re
-from bs4 import BeautifulSoup
+import configparser
 from loguru import logger
-from sacremoses import MosesPunctNormalizer
 
-mpn = MosesPunctNormalizer()
+from metrics import CLEANER_SECONDS
+
+# bs4 and sacremoses are imported on first use, they are slow to import
+
+# Read configuration
+config = configparser.ConfigParser()
+config.read("config.ini")
+
+# Elements removed together with their content before extracting text
+REMOVED_TAGS = ["script", "style", "iframe", "noscript", "header", "footer", "nav", "aside"]
+# Candidate containers for the main content, the one with the most text wins
+CONTENT_SELECTOR = "article, main, div.content, div.post, div.entry"
+HIDDEN_STYLE = re.compile(r"display:\s*none")
+
+
+def _selectolax_parser():
+    """Import the selectolax parser class, preferring the maintained lexbor backend"""
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+
+        return LexborHTMLParser
+    except ImportError:
+        from selectolax.parser import HTMLParser
+
+        return HTMLParser
+
+
+def _resolve_parser(name):
+    """Pick the configured parser backend, falling back to html.parser when it is not installed"""
+    from bs4 import BeautifulSoup, FeatureNotFound
+
+    name = (name or "html.parser").strip().lower()
+    try:
+        if name == "selectolax":
+            _selectolax_parser()
+        elif name != "html.parser":
+            BeautifulSoup("", name)
+        return name
+    except (ImportError, FeatureNotFound):
+        logger.warning(f"HTML parser '{name}' is not available, using html.parser")
+        return "html.parser"
+
+
+_parser = None
+_normalizer = None
+
+
+def parser_backend():
+    """The parser backend in use, resolved from config on first call"""
+    global _parser
+    if _parser is None:
+        _parser = _resolve_parser(config.get("cleaner", "parser", fallback="lxml"))
+    return _parser
+
+
+def _punct_normalizer():
+    global _normalizer
+    if _normalizer is None:
+        from sacremoses import MosesPunctNormalizer
+
+        _normalizer = MosesPunctNormalizer()
+    return _normalizer
 
 
 def normalize_text(text):
-    normalized_text = mpn.normalize(text)
+    normalized_text = _punct_normalizer().normalize(text)
     change_double_quote = normalized_text.replace('"', "'")
     return change_double_quote
 
 
+def _clean_text(text):
+    """Collapse whitespace and strip leftover tags from extracted text"""
+    # Replace multiple spaces with a single space
+    text = re.sub(r"\s+", " ", text)
+    # Remove any remaining HTML tags
+    return re.sub(r"<[^>]+>", "", text)
+
+
+def _outermost(nodes):
+    """Drop selectolax nodes nested in another of the given nodes, they go with their ancestor"""
+    nodes = list(nodes)
+    ids = {node.mem_id for node in nodes}
+    outermost = []
+    for node in nodes:
+        parent = node.parent
+        while parent is not None and parent.mem_id not in ids:
+            parent = parent.parent
+        if parent is None:
+            outermost.append(node)
+    return outermost
+
+
+def _is_removed(element):
+    """Whether a bs4 element is left out of the text with everything inside it"""
+    if element.name in REMOVED_TAGS:
+        return True
+    style = element.get("style") if hasattr(element, "get") else None
+    return bool(style and HIDDEN_STYLE.search(style))
+
+
+def _visible_text(element):
+    """Text of a bs4 element like get_text(" ", strip=True), skipping removed elements"""
+    from bs4 import CData, NavigableString, Tag
+
+    parts = []
+    stack = [element]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Tag):
+            if not _is_removed(node):
+                stack.extend(reversed(node.contents))
+        elif type(node) in (NavigableString, CData):
+            text = node.strip()
+            if text:
+                parts.append(text)
+    return " ".join(parts)
+
+
 class HtmlCleaner:
     """Class to clean and extract content from HTML"""
 
     @staticmethod
-    def clean_html(html):
-        """Clean HTML and extract readable content"""
-        try:
-            # Parse HTML
-            soup = BeautifulSoup(html, "html.parser")
+    def parse(html):
+        """Parse HTML once with the configured backend"""
+        with CLEANER_SECONDS.time(stage="parse"):
+            if parser_backend() == "selectolax":
+                return _selectolax_parser()(html or "")
 
-            # Remove script and style elements
-            for script_or_style in soup(["script", "style", "iframe", "noscript"]):
-                script_or_style.decompose()
+            from bs4 import BeautifulSoup
 
-            # Remove hidden elements
-            for hidden in soup.find_all(
-                attrs={"style": re.compile(r"display:\s*none")}
-            ):
-                hidden.decompose()
+            return BeautifulSoup(html or "", parser_backend())
 
-            # Remove header, footer, nav and sidebar elements
-            for nav in soup.find_all(["header", "footer", "nav", "aside"]):
-                nav.decompose()
+    @staticmethod
+    def metadata_from_tree(tree):
+        """Extract title and description from a parsed document"""
+        if parser_backend() == "selectolax":
+            title_node = tree.css_first("title")
+            title = title_node.text(strip=True) if title_node else ""
 
-            # Remove comment elements
-            for comment in soup.find_all(
-                text=lambda text: isinstance(text, str)
-                and text.strip().startswith("<!--")
-            ):
-                comment.extract()
+            description = ""
+            for selector in ('meta[name="description"]', 'meta[property="og:description"]'):
+                node = tree.css_first(selector)
+                if node and node.attributes.get("content"):
+                    description = node.attributes["content"]
+                    break
 
-            # Get main content from article, main or div containers
-            main_content = ""
-            content_elements = soup.find_all(
-                ["article", "main", "div.content", "div.post", "div.entry"]
-            )
+            node = tree.css_first('link[rel~="canonical"]')
+            canonical = (node.attributes.get("href") or "") if node else ""
+            return {"title": title, "description": description, "canonical": canonical}
 
-            if content_elements:
-                # Use the largest content element
-                largest_element = max(content_elements, key=lambda x: len(str(x)))
-                main_content = largest_element.get_text(separator=" ", strip=True)
+        # Extract title
+        title = ""
+        if tree.title:
+            title = tree.title.string or ""
+
+        # Extract description
+        description = ""
+        # Try meta description
+        meta_desc = tree.find("meta", attrs={"name": "description"})
+        if meta_desc and meta_desc.get("content"):
+            description = meta_desc.get("content")
+        else:
+            # Try Open Graph description
+            og_desc = tree.find("meta", attrs={"property": "og:description"})
+            if og_desc and og_desc.get("content"):
+                description = og_desc.get("content")
+
+        # Extract the canonical URL the page declares for itself
+        canonical = ""
+        link = tree.find("link", attrs={"rel": "canonical"})
+        if link and link.get("href"):
+            canonical = link.get("href")
+
+        return {"title": title, "description": description, "canonical": canonical}
+
+    @staticmethod
+    def content_from_tree(tree):
+        """Extract the main readable text from a parsed document
+
+        The selectolax tree is modified, the bs4 tree is left as it is.
+        """
+        if parser_backend() == "selectolax":
+            tree.strip_tags(REMOVED_TAGS)
+            for node in _outermost(
+                node
+                for node in tree.css("[style]")
+                if HIDDEN_STYLE.search(node.attributes.get("style") or "")
+            ):
+                node.decompose()
+
+            # Size candidates by their text, the longest one is the main content
+            texts = [
+                node.text(deep=True, separator=" ", strip=True)
+                for node in tree.css(CONTENT_SELECTOR)
+            ]
+            if texts:
+                main_content = max(texts, key=len)
             else:
-                # Fallback to body content
                 main_content = (
-                    soup.body.get_text(separator=" ", strip=True) if soup.body else ""
+                    tree.body.text(separator=" ", strip=True) if tree.body else ""
                 )
+            return _clean_text(main_content)
+
+        # Removed and hidden elements are skipped while reading text rather than
+        # decomposed: every decompose() scans its siblings, quadratic on big pages
+        texts = [
+            _visible_text(element)
+            for element in tree.select(CONTENT_SELECTOR)
+            if not any(_is_removed(node) for node in (element, *element.parents))
+        ]
+        if texts:
+            main_content = max(texts, key=len)
+        else:
+            # Fallback to body content
+            main_content = _visible_text(tree.body) if tree.body else ""
 
-            # Clean up the text
-            # Replace multiple spaces with a single space
-            main_content = re.sub(r"\s+", " ", main_content)
-            # Remove any remaining HTML tags
-            main_content = re.sub(r"<[^>]+>", "", main_content)
+        return _clean_text(main_content)
 
-            return main_content
+    @staticmethod
+    def clean_html(html):
+        """Clean HTML and extract readable content"""
+        try:
+            tree = HtmlCleaner.parse(html)
+            with CLEANER_SECONDS.time(stage="content"):
+                return HtmlCleaner.content_from_tree(tree)
         except Exception as e:
             logger.error(f"Error cleaning HTML: {str(e)}")
             return ""
@@ -74,56 +235,54 @@ class HtmlCleaner:
     def extract_metadata(html):
         """Extract metadata from HTML (title, description, etc.)"""
         try:
-            soup = BeautifulSoup(html, "html.parser")
-
-            # Extract title
-            title = ""
-            if soup.title:
-                title = soup.title.string
-
-            # Extract description
-            description = ""
-            # Try meta description
-            meta_desc = soup.find("meta", attrs={"name": "description"})
-            if meta_desc and meta_desc.get("content"):
-                description = meta_desc.get("content")
-            else:
-                # Try Open Graph description
-                og_desc = soup.find("meta", attrs={"property": "og:description"})
-                if og_desc and og_desc.get("content"):
-                    description = og_desc.get("content")
-
-            return {"title": title, "description": description}
+            tree = HtmlCleaner.parse(html)
+            with CLEANER_SECONDS.time(stage="metadata"):
+                return HtmlCleaner.metadata_from_tree(tree)
         except Exception as e:
             logger.error(f"Error extracting metadata: {str(e)}")
-            return {"title": "", "description": ""}
+            return {"title": "", "description": "", "canonical": ""}
 
     @staticmethod
     def process_page(crawled_data):
         """Process crawled page data and extract useful information"""
         try:
             html = crawled_data.get("html", "")
+            content = crawled_data.get("content")
+            # The HTTP tier hands over content and metadata from its own parse, empty
+            # fields included, so those pages are not parsed a second time
+            extracted = any(
+                key in crawled_data for key in ("title", "description", "canonical")
+            )
 
-            # Extract content
-            content = HtmlCleaner.clean_html(html)
+            # Parse once and reuse the tree; metadata must be read before cleaning modifies it
+            tree = None
+            if content is None or not extracted:
+                tree = HtmlCleaner.parse(html)
 
-            # Extract metadata if not already present
             metadata = {}
-            if not crawled_data.get("title") or not crawled_data.get("description"):
-                metadata = HtmlCleaner.extract_metadata(html)
+            if tree is not None:
+                with CLEANER_SECONDS.time(stage="metadata"):
+                    metadata = HtmlCleaner.metadata_from_tree(tree)
+
+            # Extract content, reusing it when the fetcher already cleaned the page
+            if content is None:
+                with CLEANER_SECONDS.time(stage="content"):
+                    content = HtmlCleaner.content_from_tree(tree)
 
             # Merge data
-            result = {
-                "url": crawled_data.get("url", ""),
-                "title": normalize_text(
-                    crawled_data.get("title") or metadata.get("title", "")
-                ),
-                "description": normalize_text(
-                    crawled_data.get("description") or metadata.get("description", "")
-                ),
-                "content": normalize_text(content),
-                "html": html,
-            }
+            with CLEANER_SECONDS.time(stage="normalize"):
+                result = {
+                    "url": crawled_data.get("url", ""),
+                    "title": normalize_text(
+                        crawled_data.get("title") or metadata.get("title", "")
+                    ),
+                    "description": normalize_text(
+                        crawled_data.get("description") or metadata.get("description", "")
+                    ),
+                    "content": normalize_text(content),
+                    "canonical": crawled_data.get("canonical") or metadata.get("canonical", ""),
+                    "html": html,
+                }
 
             return result
         except Exception as e:
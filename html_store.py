@@ -0,0 +1,110 @@
+import os
+import zlib
+import hashlib
+import argparse
+import configparser
+from loguru import logger
+
+# Read configuration
+config = configparser.ConfigParser()
+config.read("config.ini")
+
+data_folder = config.get("storage", "save_folder", fallback="data")
+
+# Where compressed HTML lives: "db" keeps blobs in the html_blobs table, "disk" under save_folder/html
+BACKEND = config.get("storage", "html_store", fallback="db").strip().lower()
+BLOB_FOLDER = os.path.join(data_folder, "html")
+
+
+def _resolve_codec(name):
+    """Pick the configured compression codec, falling back to zlib when zstandard is missing"""
+    name = (name or "zlib").strip().lower()
+    if name == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            logger.warning("zstandard is not installed, compressing HTML with zlib")
+            return "zlib"
+    return name if name in ("zstd", "zlib") else "zlib"
+
+
+CODEC = _resolve_codec(config.get("storage", "html_compression", fallback="zlib"))
+
+
+def content_hash(html):
+    """SHA-256 of the HTML text, used to deduplicate identical pages"""
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def compress(html):
+    """Compress HTML with the configured codec and return (codec, data)"""
+    raw = html.encode("utf-8")
+    if CODEC == "zstd":
+        import zstandard
+
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(raw)
+    return "zlib", zlib.compress(raw, 6)
+
+
+def decompress(codec, data):
+    """Decompress data produced by compress"""
+    if codec == "zstd":
+        import zstandard
+
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raw = zlib.decompress(data)
+    return raw.decode("utf-8")
+
+
+def blob_path(html_hash, codec):
+    """Path of a blob stored on disk, fanned out by the first two hash characters"""
+    return os.path.join(BLOB_FOLDER, html_hash[:2], f"{html_hash}.{codec}")
+
+
+def write_blob_file(html_hash, codec, data):
+    """Write a compressed blob to disk atomically"""
+    path = blob_path(html_hash, codec)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return path
+
+
+def read_blob(html_hash, codec, data=None):
+    """Return the HTML of a blob, reading it from disk when it is not stored inline"""
+    if data is None:
+        with open(blob_path(html_hash, codec), "rb") as f:
+            data = f.read()
+    return decompress(codec, data)
+
+
+def main():
+    """Command line entry point for HTML storage maintenance"""
+    parser = argparse.ArgumentParser(description="Maintain compressed HTML storage")
+    parser.add_argument(
+        "command",
+        choices=["migrate", "prune"],
+        help="migrate: move inline HTML into compressed blobs; prune: delete unused blobs",
+    )
+    parser.add_argument("--vacuum", action="store_true", help="Compact the database file afterwards")
+    args = parser.parse_args()
+
+    from database import init_db, migrate_inline_html, prune_html_blobs, vacuum
+
+    init_db(migrate_html=False)
+    if args.command == "migrate":
+        migrate_inline_html()
+    else:
+        prune_html_blobs()
+    if args.vacuum:
+        vacuum()
+
+
+if __name__ == "__main__":
+    main()
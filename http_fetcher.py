@@ -0,0 +1,195 @@
+import configparser
+import re
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+from html_cleaner import HtmlCleaner
+from html_store import content_hash
+from metrics import CLEANER_SECONDS, PAGE_SOURCE_BYTES
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+# Charset declared in a <meta> tag near the top of the document
+META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+# Empty mount points left by client-side frameworks (React, Vue, Next.js, Nuxt)
+EMPTY_APP_ROOT = re.compile(
+    r"""<div[^>]+id=["'](?:root|app|__next|__nuxt)["'][^>]*>\s*</div>""",
+    re.IGNORECASE,
+)
+NOSCRIPT_WARNING = re.compile(
+    r"<noscript[^>]*>[^<]*(?:enable|aktifkan)[^<]*javascript", re.IGNORECASE
+)
+
+
+def get_domain(url):
+    """Get the lowercase host of a URL"""
+    return (urlparse(url).hostname or "").lower()
+
+
+def header_value(headers, name):
+    """Look up a header case-insensitively in a plain dict, as browsers may lowercase names"""
+    name = name.lower()
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def conditional_headers(validators):
+    """Request headers that let the server answer 304 when a stored copy is still current"""
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+class HttpFetcher:
+    """Plain HTTP fetcher with a pooled keep-alive session, tried before Selenium"""
+
+    def __init__(self):
+        # Read configuration
+        self.config = configparser.ConfigParser()
+        self.config.read("config.ini")
+
+        self.enabled = self.config.getboolean("fetcher", "enabled", fallback=True)
+        self.timeout = self.config.getint("fetcher", "timeout", fallback=15)
+        self.min_content_length = self.config.getint(
+            "fetcher", "min_content_length", fallback=500
+        )
+        self.user_agent = self.config.get(
+            "fetcher", "user_agent", fallback=DEFAULT_USER_AGENT
+        ) or DEFAULT_USER_AGENT
+        pool_size = self.config.getint("fetcher", "pool_size", fallback=10)
+
+        # Keep-alive connections are reused across requests to the same host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {
+                "User-Agent": self.user_agent,
+                "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "id,en;q=0.8",
+            }
+        )
+
+    @staticmethod
+    def decode(response):
+        """Decode a response body using the header charset, then <meta> charset, then UTF-8"""
+        content_type = response.headers.get("Content-Type", "")
+        encoding = None
+        if "charset=" in content_type.lower():
+            encoding = response.encoding
+        else:
+            match = META_CHARSET.search(response.content[:4096])
+            if match:
+                encoding = match.group(1).decode("ascii", "ignore")
+
+        try:
+            return response.content.decode(encoding or "utf-8", errors="replace")
+        except LookupError:
+            return response.content.decode("utf-8", errors="replace")
+
+    def fetch(self, url, validators=None):
+        """Fetch a URL over HTTP and return crawled data with cleaned content, or None
+
+        With the validators of a stored copy the request is conditional, and an
+        unchanged page comes back as a small dict with "not_modified" set.
+        """
+        validators = validators or {}
+        try:
+            response = self.session.get(
+                url, timeout=self.timeout, headers=conditional_headers(validators)
+            )
+        except requests.RequestException as e:
+            logger.warning(f"HTTP fetch failed for {url}: {str(e)}")
+            return None
+
+        if response.status_code == 304 and validators:
+            return self._not_modified(url, response)
+
+        content_type = response.headers.get("Content-Type", "")
+        if response.status_code != 200 or "html" not in content_type.lower():
+            logger.info(
+                f"HTTP fetch of {url} returned {response.status_code} ({content_type})"
+            )
+            return None
+
+        html = self.decode(response)
+        PAGE_SOURCE_BYTES.observe(len(response.content), tier="http")
+
+        # Servers without validators still let us skip unchanged bodies by their hash
+        source_hash = content_hash(html)
+        if validators.get("source_hash") == source_hash:
+            return self._not_modified(url, response)
+
+        # Parse once for both metadata and content
+        try:
+            tree = HtmlCleaner.parse(html)
+            with CLEANER_SECONDS.time(stage="metadata"):
+                metadata = HtmlCleaner.metadata_from_tree(tree)
+            with CLEANER_SECONDS.time(stage="content"):
+                content = HtmlCleaner.content_from_tree(tree)
+        except Exception as e:
+            logger.error(f"Error cleaning HTML from {url}: {str(e)}")
+            metadata, content = {}, ""
+
+        return {
+            "url": url,
+            "title": metadata.get("title"),
+            "description": metadata.get("description"),
+            "canonical": metadata.get("canonical"),
+            "html": html,
+            "content": content,
+            "status": response.status_code,
+            "headers": dict(response.headers),
+            "source_hash": source_hash,
+        }
+
+    @staticmethod
+    def _not_modified(url, response):
+        logger.info(f"{url} has not changed ({response.status_code})")
+        return {
+            "url": url,
+            "not_modified": True,
+            "status": response.status_code,
+            "headers": dict(response.headers),
+        }
+
+    def head_not_modified(self, url, validators):
+        """Check with a conditional HEAD request whether a stored copy is still current"""
+        headers = conditional_headers(validators)
+        if not headers:
+            return None
+        try:
+            response = self.session.head(
+                url, timeout=self.timeout, headers=headers, allow_redirects=True
+            )
+        except requests.RequestException as e:
+            logger.warning(f"HTTP revalidation failed for {url}: {str(e)}")
+            return None
+        if response.status_code != 304:
+            return None
+        return self._not_modified(url, response)
+
+    def needs_browser(self, crawled_data):
+        """Return why a fetched page needs a real browser, or None if it is usable"""
+        html = crawled_data.get("html", "")
+        content = crawled_data.get("content", "")
+
+        if len(content) < self.min_content_length:
+            return f"content too small ({len(content)} chars)"
+        if EMPTY_APP_ROOT.search(html):
+            return "empty JavaScript app root"
+        if NOSCRIPT_WARNING.search(html) and len(content) < self.min_content_length * 4:
+            return "page asks for JavaScript"
+        return None
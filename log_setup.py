@@ -0,0 +1,32 @@
+import threading
+import time
+from loguru import logger
+
+LOG_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}"
+
+_configured = False
+_lock = threading.Lock()
+
+
+def setup_logging(level="INFO", log_file=True):
+    """Setup logger with daily rotation, once per process
+
+    Sinks are only replaced here at startup, never while other threads are
+    logging. Later calls are ignored, so the first caller decides the setup.
+    """
+    global _configured
+    with _lock:
+        if _configured:
+            return False
+        _configured = True
+
+        logger.remove()  # Remove default handler
+        if log_file:
+            logger.add(
+                f"logs/{time.strftime('%Y-%m-%d')}.log",
+                rotation="00:00",
+                format=LOG_FORMAT,
+                level=level,
+            )
+        logger.add(lambda msg: print(msg), format=LOG_FORMAT, level=level)
+        return True
@@ -5,9 +5,9 @@ import threading
 import uvicorn
 import configparser
 import webbrowser
-from datetime import datetime
 from loguru import logger
 from database import init_db
+from log_setup import setup_logging
 
 # Needed for multiprocessing with PyInstaller
 import multiprocessing
@@ -58,18 +58,6 @@ def create_required_directories():
     os.makedirs(data_folder, exist_ok=True)
 
 
-def setup_logging():
-    """Setup logger with daily rotation"""
-    log_format = "{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}"
-    log_file = f"logs/{datetime.now().strftime('%Y-%m-%d')}.log"
-
-    logger.remove()  # Remove default handler
-    logger.add(log_file, rotation="00:00", format=log_format, level="INFO")
-
-    # Add console handler
-    logger.add(lambda msg: print(msg), format=log_format, level="INFO")
-
-
 def start_server(host, port):
     """Start the FastAPI server"""
     global is_server_running
@@ -256,7 +244,7 @@ def create_gui():
             # Try to connect to the server with a short timeout
             try:
                 response = urllib.request.urlopen(
-                    f"http://{host}:{port}/api/status", timeout=0.5
+                    f"http://{host}:{port}/api/status", timeout=2
                 )
                 if response.getcode() == 200:
                     is_server_running = True
@@ -265,9 +253,20 @@ def create_gui():
                     browser_button.config(state=tk.NORMAL)
                     status_var.set("Running")
                     return True
-            except (urllib.error.URLError, ConnectionRefusedError, socket.timeout):
-                # Server is not responding
-                pass
+            except urllib.error.HTTPError:
+                # Server answered, even if with an error status
+                is_server_running = True
+                status_var.set("Running (busy)")
+                return True
+            except (urllib.error.URLError, ConnectionRefusedError, socket.timeout) as e:
+                # A slow answer while the server thread is alive means it is busy, not stopped
+                timed_out = isinstance(e, socket.timeout) or isinstance(
+                    getattr(e, "reason", None), socket.timeout
+                )
+                if timed_out and server_thread is not None and server_thread.is_alive():
+                    is_server_running = True
+                    status_var.set("Running (busy)")
+                    return True
 
             # Server is not running
             is_server_running = False
@@ -0,0 +1,206 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Bucket bounds in seconds for stage timings, from sub-millisecond parsing to slow page loads
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Bucket bounds in bytes for page sizes
+SIZE_BUCKETS = (10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base for metrics with optional labels, kept in memory"""
+
+    kind = "untyped"
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self):
+        """Lines of this metric in the Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"]
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """Distribution of observed values over fixed buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=TIME_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            index = bisect_left(self.buckets, value)
+            if index < len(counts):
+                counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the wrapped block takes, in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_sample(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            le = _format_labels(self.labels, key, f'le="{_format_value(float(bound))}"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        le = _format_labels(self.labels, key, 'le="+Inf"')
+        lines.append(f"{self.name}_bucket{le} {count}")
+        labels = _format_labels(self.labels, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge(Metric):
+    """Current value read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name, description, callback, labels=()):
+        super().__init__(name, description, labels)
+        self.callback = callback
+
+    def render(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        # Labelled gauges return {label values tuple: value}
+        values = value if isinstance(value, dict) else {(): value}
+        with self._lock:
+            self._values = {
+                key if isinstance(key, tuple) else (key,): val
+                for key, val in values.items()
+                if val is not None
+            }
+        return super().render()
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, description, labels=()):
+        return self.register(Counter(name, description, labels))
+
+    def histogram(self, name, description, labels=(), buckets=TIME_BUCKETS):
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def gauge(self, name, description, callback, labels=()):
+        return self.register(Gauge(name, description, callback, labels))
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Crawl pipeline stages
+EXECUTOR_QUEUE_WAIT = registry.histogram(
+    "crawler_executor_queue_wait_seconds", "Time tasks wait in an executor queue", ["executor"]
+)
+BROWSER_CHECKOUT = registry.histogram(
+    "crawler_browser_checkout_seconds", "Time waiting for a pooled browser"
+)
+NAVIGATION = registry.histogram(
+    "crawler_navigation_seconds", "Time for the browser to load a URL"
+)
+READINESS_WAIT = registry.histogram(
+    "crawler_readiness_wait_seconds", "Time waiting for a loaded page to become ready"
+)
+PAGE_SOURCE_BYTES = registry.histogram(
+    "crawler_page_source_bytes", "Size of crawled page HTML in bytes", ["tier"], buckets=SIZE_BUCKETS
+)
+FETCHES = registry.counter(
+    "crawler_fetches_total", "Pages fetched by tier and outcome", ["tier", "outcome"]
+)
+FETCH_SECONDS = registry.histogram(
+    "crawler_fetch_seconds", "Time to fetch a page, per tier", ["tier"]
+)
+CLEANER_SECONDS = registry.histogram(
+    "crawler_cleaner_seconds", "Time spent in HtmlCleaner stages", ["stage"]
+)
+DB_SAVE_SECONDS = registry.histogram(
+    "crawler_db_save_seconds", "Time to store a crawled page, including the commit"
+)
+API_REQUESTS = registry.histogram(
+    "crawler_api_request_seconds", "API request latency", ["method", "route", "status"]
+)
+RECRAWL_CHECKS = registry.counter(
+    "crawler_recrawl_checks_total",
+    "Freshness checks of stored pages by outcome and whether the page cache answered",
+    ["result", "source"],
+)
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    """Rough memory footprint of a cached page dictionary in bytes"""
+    if isinstance(value, dict):
+        return sum(len(str(key)) + estimate_size(item) for key, item in value.items())
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_size(item) for item in value)
+    if isinstance(value, str):
+        return len(value)
+    return 16
+
+
+class PageCache:
+    """In-memory LRU cache bounded by entry count and total size, with per-entry expiry"""
+
+    def __init__(self, max_entries=1000, max_bytes=64 * 1024 * 1024, ttl=3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        # Invalidation stamps of recently written keys, so a reader that loaded a
+        # page before a write cannot cache the old version after it
+        self._generations = OrderedDict()
+        self._clock = 0
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """Get a cached value, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _generation(self, key):
+        return self._generations.get(key, self._floor)
+
+    def generation(self, key):
+        """Stamp to pass to put when the value is read from elsewhere, taken before reading it"""
+        with self._lock:
+            return self._generation(key)
+
+    def put(self, key, value, ttl=None, generation=None):
+        """Cache a value for ttl seconds (capped at the cache ttl), evicting least recently used entries
+
+        With a generation from generation(), the value is dropped when the key
+        was invalidated since, as it may be older than what was written.
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if generation is not None and self._generation(key) != generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop a cached value"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._clock += 1
+            self._generations[key] = self._clock
+            self._generations.move_to_end(key)
+            # Forgotten stamps raise the floor, so older reads of those keys are still refused
+            while len(self._generations) > self.max_entries:
+                _, stamp = self._generations.popitem(last=False)
+                self._floor = max(self._floor, stamp)
+
+    def clear(self):
+        """Drop every cached value"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            # Reads that started before the clear must not refill the cache
+            self._clock += 1
+            self._generations.clear()
+            self._floor = self._clock
+
+    def stats(self):
+        """Get hit, miss and eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,201 @@
+import configparser
+import json
+import time
+from urllib.parse import urlparse
+from loguru import logger
+
+# Installs a MutationObserver once per document and returns milliseconds since the last DOM change;
+# attribute changes are left out, carousels and lazy images rewrite them all the time
+DOM_QUIET_SCRIPT = """
+if (!window.__dikonteninObserver) {
+    window.__dikonteninLastMutation = performance.now();
+    window.__dikonteninObserver = new MutationObserver(function () {
+        window.__dikonteninLastMutation = performance.now();
+    });
+    window.__dikonteninObserver.observe(document, {
+        childList: true, subtree: true, characterData: true
+    });
+}
+return performance.now() - window.__dikonteninLastMutation;
+"""
+
+POLL_INTERVAL = 0.1
+# Document states in which the DOM is parsed and content can be read
+READY_STATES = ("interactive", "complete")
+
+
+class ReadinessWaiter:
+    """Wait until a page is ready instead of sleeping a fixed amount of time"""
+
+    def __init__(self, config=None, timeout=None):
+        # Read configuration
+        if config is None:
+            config = configparser.ConfigParser()
+            config.read("config.ini")
+
+        self.timeout = timeout or config.getint("crawler", "browser_timeout", fallback=60)
+        self.dom_quiet_ms = config.getint("readiness", "dom_quiet_ms", fallback=500)
+        self.network_idle_ms = config.getint("readiness", "network_idle_ms", fallback=500)
+        self.network_idle_connections = config.getint(
+            "readiness", "network_idle_connections", fallback=2
+        )
+        # Long-polling and analytics beacons can keep the network busy forever
+        self.network_idle_timeout = config.getfloat(
+            "readiness", "network_idle_timeout", fallback=5
+        )
+        # Tickers and countdowns keep changing the DOM, so it may never look quiet
+        self.dom_quiet_timeout = config.getfloat("readiness", "dom_quiet_timeout", fallback=3)
+
+        # Per-domain CSS selectors that must be present before the page counts as ready
+        self.wait_rules = {}
+        if config.has_section("wait_rules"):
+            for domain, selector in config.items("wait_rules"):
+                self.wait_rules[domain.lower()] = selector
+
+    def selector_for(self, url):
+        """Find the wait rule for a URL's host, matching parent domains too"""
+        host = (urlparse(url).hostname or "").lower()
+        while host:
+            if host in self.wait_rules:
+                return self.wait_rules[host]
+            if "." not in host:
+                break
+            host = host.split(".", 1)[1]
+        return None
+
+    @staticmethod
+    def drain_performance_log(browser):
+        """Read pending CDP performance log entries, or None if logging is unavailable"""
+        try:
+            entries = browser.get_log("performance")
+        except Exception:
+            return None
+
+        messages = []
+        for entry in entries:
+            try:
+                messages.append(json.loads(entry["message"])["message"])
+            except (KeyError, ValueError):
+                continue
+        return messages
+
+    def _wait_ready_state(self, browser, deadline):
+        """Wait until the document is parsed; subresources are covered by the network idle wait
+
+        'interactive' is enough: waiting for 'complete' would bring back the full
+        page load the eager page load strategy skips.
+        """
+        while time.monotonic() < deadline:
+            try:
+                if browser.execute_script("return document.readyState") in READY_STATES:
+                    return True
+            except Exception:
+                pass
+            time.sleep(POLL_INTERVAL)
+        return False
+
+    def _wait_dom_stable(self, browser, deadline):
+        """Wait until the DOM has not changed for dom_quiet_ms"""
+        deadline = min(deadline, time.monotonic() + self.dom_quiet_timeout)
+        while time.monotonic() < deadline:
+            try:
+                quiet_for = browser.execute_script(DOM_QUIET_SCRIPT)
+            except Exception:
+                return False
+            if quiet_for is not None and quiet_for >= self.dom_quiet_ms:
+                return True
+            time.sleep(POLL_INTERVAL)
+        return False
+
+    def _wait_network_idle(self, browser, deadline, state):
+        """Wait until in-flight requests drop to network_idle_connections for network_idle_ms"""
+        deadline = min(deadline, time.monotonic() + self.network_idle_timeout)
+        inflight = state["inflight"]
+        last_change = time.monotonic()
+
+        while time.monotonic() < deadline:
+            messages = self.drain_performance_log(browser)
+            if messages is None:
+                return False
+
+            if self._track_network(messages, state):
+                last_change = time.monotonic()
+
+            idle_for = (time.monotonic() - last_change) * 1000
+            if len(inflight) <= self.network_idle_connections and idle_for >= self.network_idle_ms:
+                return True
+            time.sleep(POLL_INTERVAL)
+        return False
+
+    @staticmethod
+    def _track_network(messages, state):
+        """Update in-flight requests and the main document response from CDP events"""
+        inflight = state["inflight"]
+        changed = False
+        for message in messages:
+            method = message.get("method", "")
+            params = message.get("params", {})
+            request_id = params.get("requestId")
+
+            if method == "Network.requestWillBeSent":
+                inflight.add(request_id)
+                changed = True
+            elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+                inflight.discard(request_id)
+                changed = True
+            elif (
+                method == "Network.responseReceived"
+                and params.get("type") == "Document"
+                and state["document"] is None
+            ):
+                response = params.get("response", {})
+                state["document"] = {
+                    "url": response.get("url"),
+                    "status": response.get("status"),
+                    "headers": response.get("headers", {}),
+                }
+        return changed
+
+    def _wait_selector(self, browser, selector, deadline):
+        """Wait for a CSS selector to match at least one element"""
+        from selenium.webdriver.common.by import By
+
+        while time.monotonic() < deadline:
+            try:
+                if browser.find_elements(By.CSS_SELECTOR, selector):
+                    return True
+            except Exception:
+                return False
+            time.sleep(POLL_INTERVAL)
+        return False
+
+    def wait(self, browser, url, started=None):
+        """Wait until the page loaded from url is ready and return how long each step took"""
+        started = started or time.monotonic()
+        deadline = started + self.timeout
+        timings = {}
+        state = {"inflight": set(), "document": None}
+
+        step_started = time.monotonic()
+        timings["ready_state"] = self._wait_ready_state(browser, deadline)
+        timings["ready_state_seconds"] = round(time.monotonic() - step_started, 3)
+
+        step_started = time.monotonic()
+        timings["network_idle"] = self._wait_network_idle(browser, deadline, state)
+        timings["network_idle_seconds"] = round(time.monotonic() - step_started, 3)
+
+        step_started = time.monotonic()
+        timings["dom_stable"] = self._wait_dom_stable(browser, deadline)
+        timings["dom_stable_seconds"] = round(time.monotonic() - step_started, 3)
+
+        selector = self.selector_for(url)
+        if selector:
+            step_started = time.monotonic()
+            timings["selector"] = self._wait_selector(browser, selector, deadline)
+            timings["selector_seconds"] = round(time.monotonic() - step_started, 3)
+            if not timings["selector"]:
+                logger.warning(f"Wait rule '{selector}' not matched for {url}")
+
+        timings["total_seconds"] = round(time.monotonic() - started, 3)
+        timings["document"] = state["document"]
+        return timings
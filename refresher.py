@@ -0,0 +1,152 @@
+import configparser
+import threading
+import time
+from concurrent.futures import wait
+from datetime import datetime, timedelta
+from loguru import logger
+
+from crawl_service import crawl_executor, crawl_scheduler, crawl_and_store
+from crawl_scheduler import HostThrottled
+from http_fetcher import get_domain
+from task_executor import ExecutorBusy
+from database import SKIP_CRAWL_DAYS, decay_access_counts, flush_access_counts, get_pages_due
+
+# Read configuration
+config = configparser.ConfigParser()
+config.read("config.ini")
+
+
+class Refresher:
+    """Background thread that re-crawls popular pages shortly before they go stale"""
+
+    def __init__(self):
+        self.enabled = config.getboolean("refresher", "enabled", fallback=False)
+        self.interval = config.getint("refresher", "interval", fallback=300)
+        self.lead_time = timedelta(
+            hours=config.getfloat("refresher", "lead_hours", fallback=24)
+        )
+        self.batch_size = config.getint("refresher", "batch_size", fallback=50)
+        self.concurrency = max(1, config.getint("refresher", "concurrency", fallback=1))
+        self.domain_budget = config.getint("refresher", "domain_budget", fallback=10)
+        # Access counts are scaled by this every run, so pages popular long ago fade out
+        self.access_decay = min(
+            1.0, max(0.0, config.getfloat("refresher", "access_decay", fallback=0.5))
+        )
+
+        self._stop = threading.Event()
+        self._thread = None
+        self.refreshed = 0
+        self.failed = 0
+        self.last_run = None
+
+    def start(self):
+        """Start the background thread; access counts are flushed even when refreshing is off"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and write pending access counts"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        flush_access_counts()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                flush_access_counts()
+                if self.enabled:
+                    self.run_once()
+            except Exception as e:
+                logger.error(f"Error refreshing pages: {str(e)}")
+
+    def due_urls(self):
+        """URLs that go stale within the lead time, most read first, within each domain's budget
+
+        Pages nobody read since their last crawl are left to expire.
+        """
+        crawled_before = datetime.now() - timedelta(days=SKIP_CRAWL_DAYS) + self.lead_time
+        # Read extra rows so busy domains over their budget do not starve the batch
+        rows = get_pages_due(crawled_before, self.batch_size * 4)
+
+        per_domain = {}
+        urls = []
+        for url, _ in rows:
+            domain = get_domain(url)
+            if per_domain.get(domain, 0) >= self.domain_budget:
+                continue
+            per_domain[domain] = per_domain.get(domain, 0) + 1
+            urls.append(url)
+            if len(urls) >= self.batch_size:
+                break
+        return urls
+
+    def run_once(self):
+        """Refresh one batch of pages, a few at a time, yielding to user crawls when busy"""
+        started = time.monotonic()
+        checked_at = datetime.now()
+        urls = self.due_urls()
+        if self.access_decay < 1:
+            decay_access_counts(self.access_decay)
+        refreshed = 0
+
+        busy = False
+        for start in range(0, len(urls), self.concurrency):
+            if busy or self._stop.is_set():
+                break
+
+            futures = []
+            for url in urls[start : start + self.concurrency]:
+                # Hosts that are busy now are left for the next run, no worker waits for them
+                try:
+                    crawl_scheduler.prepare(url)
+                    if crawl_scheduler.try_acquire(url):
+                        continue
+                except HostThrottled:
+                    continue
+                try:
+                    futures.append(crawl_executor.submit(self._refresh, url, checked_at))
+                except ExecutorBusy:
+                    crawl_scheduler.release(url)
+                    logger.info("Crawl executor is busy, postponing page refresh")
+                    busy = True
+                    break
+
+            wait(futures)
+            for future in futures:
+                if future.exception() is None and future.result():
+                    refreshed += 1
+                else:
+                    self.failed += 1
+
+        self.refreshed += refreshed
+        self.last_run = datetime.now()
+        if urls:
+            logger.info(
+                f"Refreshed {refreshed} of {len(urls)} pages in "
+                f"{round(time.monotonic() - started, 2)} seconds"
+            )
+        return refreshed
+
+    @staticmethod
+    def _refresh(url, checked_at):
+        """Re-crawl one page with the host slot taken by run_once"""
+        try:
+            return crawl_and_store(url, since=checked_at, slot_held=True)
+        finally:
+            crawl_scheduler.release(url)
+
+    def stats(self):
+        """Get refresher settings and counters"""
+        return {
+            "enabled": self.enabled,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+        }
+
+
+refresher = Refresher()
@@ -0,0 +1,240 @@
+import argparse
+import configparser
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from loguru import logger
+
+import html_store
+from html_cleaner import HtmlCleaner
+from database import (
+    init_db,
+    get_session,
+    serialized_write,
+    page_cache,
+    CrawledPage,
+    HtmlBlob,
+    SQLITE_MAX_VARIABLES,
+)
+
+# Read configuration
+config = configparser.ConfigParser()
+config.read("config.ini")
+
+# Progress of the reprocess run started from the API, if any
+status = {"running": False}
+_status_lock = threading.Lock()
+
+
+def _reprocess_row(row):
+    """Re-run the cleaner over one stored page; runs in a worker process
+
+    Returns the page id, the outcome counted in the run result ("processed",
+    "failed" or "skipped") and the new values of a processed page.
+    """
+    page_id, url, title, description, html, html_hash, codec, data = row
+
+    # Compressed HTML is shipped to the worker as is and only expanded here
+    if html_hash and codec:
+        try:
+            html = html_store.read_blob(html_hash, codec, data)
+        except OSError:
+            html = None
+    # Without its HTML the page keeps the content it has
+    if not html:
+        return page_id, "skipped", None
+
+    processed = HtmlCleaner.process_page(
+        {"url": url, "title": title, "description": description, "html": html}
+    )
+    if not processed:
+        return page_id, "failed", None
+    return page_id, "processed", {
+        "id": page_id,
+        "title": processed["title"],
+        "description": processed["description"],
+        "content": processed["content"],
+    }
+
+
+def _load_chunk(limit, url=None, since=None, after_id=0, ids=None):
+    """Load up to limit stored pages with an id above after_id, with their compressed HTML"""
+    session = get_session()
+    try:
+        query = session.query(
+            CrawledPage.id,
+            CrawledPage.url,
+            CrawledPage.title,
+            CrawledPage.description,
+            CrawledPage.html,
+            CrawledPage.html_hash,
+            HtmlBlob.codec,
+            HtmlBlob.data,
+        ).outerjoin(HtmlBlob, HtmlBlob.hash == CrawledPage.html_hash).filter(
+            CrawledPage.id > after_id
+        )
+
+        if url:
+            query = query.filter(CrawledPage.url.ilike(f"%{url}%"))
+        if since:
+            query = query.filter(CrawledPage.last_crawled_at >= since)
+        if ids:
+            query = query.filter(CrawledPage.id.in_(ids))
+
+        return [tuple(row) for row in query.order_by(CrawledPage.id).limit(limit)]
+    finally:
+        session.close()
+
+
+def _iter_chunks(chunk_size, url=None, since=None, ids=None):
+    """Yield stored pages in id order, chunk by chunk, without holding them all in memory"""
+    if ids:
+        # Each chunk binds only its own slice of ids, staying under SQLite's variable limit
+        ids = sorted(set(ids))
+        step = max(1, min(chunk_size, SQLITE_MAX_VARIABLES))
+        for start in range(0, len(ids), step):
+            rows = _load_chunk(step, url=url, since=since, ids=ids[start : start + step])
+            if rows:
+                yield rows
+        return
+
+    last_id = 0
+    while True:
+        rows = _load_chunk(chunk_size, url=url, since=since, after_id=last_id)
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+@serialized_write
+def _write_chunk(mappings):
+    """Write one chunk of reprocessed pages in a single transaction"""
+    session = get_session()
+    try:
+        session.bulk_update_mappings(CrawledPage, mappings)
+        session.commit()
+        # Cached pages may now hold outdated content
+        if page_cache:
+            page_cache.clear()
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+
+def reprocess_pages(url=None, since=None, ids=None, workers=None, chunk_size=None):
+    """Re-run HtmlCleaner.process_page over stored HTML in a process pool"""
+    workers = workers or config.getint(
+        "reprocess", "workers", fallback=max(1, (os.cpu_count() or 2) - 1)
+    )
+    chunk_size = chunk_size or config.getint("reprocess", "chunk_size", fallback=500)
+
+    started = time.monotonic()
+    result = {"processed": 0, "failed": 0, "skipped": 0}
+    logger.info(f"Reprocessing stored pages with {workers} worker processes")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for rows in _iter_chunks(chunk_size, url=url, since=since, ids=ids):
+            mappings = []
+            for page_id, outcome, mapping in executor.map(
+                _reprocess_row, rows, chunksize=max(1, len(rows) // (workers * 4))
+            ):
+                result[outcome] += 1
+                if mapping:
+                    mappings.append(mapping)
+                elif outcome == "skipped":
+                    logger.warning(f"No stored HTML for page {page_id}, skipped")
+                else:
+                    logger.warning(f"Failed to reprocess page {page_id}")
+
+            if mappings:
+                _write_chunk(mappings)
+
+            with _status_lock:
+                if status.get("running"):
+                    status.update(result)
+            logger.info(f"Reprocessed {result['processed']} pages so far")
+
+    result["seconds"] = round(time.monotonic() - started, 2)
+    logger.info(
+        f"Reprocessed {result['processed']} pages ({result['failed']} failed, "
+        f"{result['skipped']} without HTML) "
+        f"in {result['seconds']} seconds"
+    )
+    return result
+
+
+def start_reprocess(url=None, since=None, ids=None):
+    """Start reprocessing in a background thread; returns False if a run is in progress"""
+    with _status_lock:
+        if status.get("running"):
+            return False
+        status.clear()
+        status.update(
+            {
+                "running": True,
+                "processed": 0,
+                "failed": 0,
+                "skipped": 0,
+                "started_at": datetime.now().isoformat(),
+            }
+        )
+
+    def run():
+        try:
+            result = reprocess_pages(url=url, since=since, ids=ids)
+            with _status_lock:
+                status.update(result)
+        except Exception as e:
+            logger.error(f"Error reprocessing pages: {str(e)}")
+            with _status_lock:
+                status["error"] = str(e)
+        finally:
+            with _status_lock:
+                status["running"] = False
+                status["finished_at"] = datetime.now().isoformat()
+
+    threading.Thread(target=run, daemon=True).start()
+    return True
+
+
+def get_status():
+    """Get progress of the current or last reprocess run"""
+    with _status_lock:
+        return dict(status)
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(
+        description="Rebuild cleaned content from stored HTML without re-crawling"
+    )
+    parser.add_argument("--url", help="Only pages whose URL contains this text")
+    parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="Only pages crawled on or after this date (YYYY-MM-DD)",
+    )
+    parser.add_argument("--ids", type=int, nargs="+", help="Only these page ids")
+    parser.add_argument("--workers", type=int, help="Number of worker processes")
+    parser.add_argument("--chunk-size", type=int, help="Pages per write transaction")
+    args = parser.parse_args()
+
+    init_db()
+    reprocess_pages(
+        url=args.url,
+        since=args.since,
+        ids=args.ids,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+    )
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -7,11 +7,16 @@ import re
 import shutil
 import platform
 import subprocess
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
+import threading
 from loguru import logger
-from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from page_readiness import ReadinessWaiter
+from browser_profile import BrowserProfile
+from metrics import NAVIGATION, READINESS_WAIT, PAGE_SOURCE_BYTES
+
+# Chrome binary and ChromeDriver paths, resolved once and reused by every browser start
+_resolved_paths = {}
+_resolve_lock = threading.Lock()
 
 
 class SeleniumCrawler:
@@ -25,30 +30,121 @@ class SeleniumCrawler:
             "crawler", "browser_timeout", fallback=60
         )
         self.sleep_time = self.config.getint("crawler", "sleep_time", fallback=3)
+        # "readiness" waits for the page to settle, "sleep" keeps the fixed sleep_time wait
+        self.wait_strategy = self.config.get(
+            "crawler", "wait_strategy", fallback="readiness"
+        )
+        self.readiness = ReadinessWaiter(self.config, self.browser_timeout)
+        # Headless, resource-blocking launch settings
+        self.profile = BrowserProfile(self.config)
+        # Each page loads in a fresh tab that is closed afterwards, instead of reusing one
+        self.fresh_tab = self.config.getboolean("crawler", "fresh_tab_per_page", fallback=True)
         
         # Get browser path from config if specified
         self.chrome_path = self.config.get("crawler", "browser_path", fallback=None)
 
-        # Initialize logger
-        self._setup_logger()
-
         # Initialize browser
         self.browser = None
+        self.base_handle = None
+
+        # Health tracking used by the browser pool
+        self.pages_crawled = 0
+        self.error_count = 0
+        self.healthy = True
+        # "webdriver" when the last crawl failed because of the browser rather than the page
+        self.last_error = None
+
+    def _find_chrome_path(self):
+        """Find the Chrome binary, from config or common install locations"""
+        try:
+            # First check if user specified browser path in config
+            chrome_path = None
+
+            if self.chrome_path and os.path.exists(self.chrome_path):
+                chrome_path = self.chrome_path
+                logger.info(f"Using user-configured Chrome browser at: {chrome_path}")
+            else:
+                # Look for Chrome in common locations
+                possible_paths = [
+                    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+                    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+                    r"C:\Users\%USERNAME%\AppData\Local\Google\Chrome\Application\chrome.exe"
+                ]
+
+                for path in possible_paths:
+                    if os.path.exists(os.path.expandvars(path)):
+                        chrome_path = os.path.expandvars(path)
+                        break
+
+            if chrome_path:
+                logger.info(f"Chrome found at: {chrome_path}")
+            else:
+                logger.warning("Chrome not found! Please set browser_path in config.ini.")
+                # Try to proceed with default binary location
+            return chrome_path
+        except Exception as ce:
+            logger.warning(f"Could not verify Chrome installation: {str(ce)}")
+            return None
 
-    def _setup_logger(self):
-        """Setup logger with daily rotation"""
-        log_format = "{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}"
-        logger.remove()  # Remove default handler
-        logger.add(
-            f"logs/{time.strftime('%Y-%m-%d')}.log",
-            rotation="00:00",
-            format=log_format,
-            level="INFO",
+    def _find_driver_path(self):
+        """Find ChromeDriver locally, falling back to webdriver_manager"""
+        # Check for local chromedriver in chrome_driver folder
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        driver_dir = os.path.join(base_dir, "chrome_driver")
+        driver_path = os.path.join(driver_dir, "chromedriver.exe")
+
+        # Create chrome_driver directory if it doesn't exist
+        os.makedirs(driver_dir, exist_ok=True)
+
+        # Check if chromedriver exists in the chrome_driver folder
+        if os.path.exists(driver_path):
+            logger.info(f"Using ChromeDriver from: {driver_path}")
+            return driver_path
+
+        # Check alternate locations
+        alternate_paths = [
+            os.path.join(base_dir, "chromedriver.exe"),
+            os.path.join(base_dir, "drivers", "chromedriver.exe")
+        ]
+
+        for alt_path in alternate_paths:
+            if os.path.exists(alt_path):
+                logger.info(f"Using ChromeDriver from: {alt_path}")
+                return alt_path
+
+        # Try using webdriver_manager as a last resort
+        try:
+            logger.info("Trying to use webdriver_manager...")
+            from webdriver_manager.chrome import ChromeDriverManager
+            driver_path = ChromeDriverManager().install()
+            logger.info(f"ChromeDriver installed at: {driver_path}")
+            return driver_path
+        except Exception as e:
+            logger.warning(f"webdriver_manager failed: {str(e)}")
+
+        error_msg = (
+            "ChromeDriver not found. Please download the correct ChromeDriver version for your Chrome from\n"
+            "https://chromedriver.chromium.org/downloads\n"
+            f"and place chromedriver.exe in the {driver_dir} folder."
         )
-        logger.add(lambda msg: print(msg), format=log_format, level="INFO")
+        logger.error(error_msg)
+        raise Exception(error_msg)
+
+    def _resolve_paths(self):
+        """Chrome and ChromeDriver paths, resolved once per process and shared by every crawler"""
+        with _resolve_lock:
+            if not _resolved_paths:
+                chrome_path = self._find_chrome_path()
+                _resolved_paths.update(chrome=chrome_path, driver=self._find_driver_path())
+            return _resolved_paths["chrome"], _resolved_paths["driver"]
 
     def _initialize_browser(self):
         """Initialize browser with optimized settings and better error handling"""
+        # Selenium is only imported once a browser is actually needed
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+
         try:
             logger.info("Initializing browser...")
 
@@ -61,91 +157,31 @@ class SeleniumCrawler:
             chrome_options.add_argument("--disable-gpu")
             chrome_options.add_argument("--no-sandbox")
             chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--window-size=800,600")
-            chrome_options.add_argument("--start-minimized")
             chrome_options.add_argument("--disable-extensions")
             chrome_options.add_argument("--disable-infobars")
-            
-            try:
-                # First check if user specified browser path in config
-                chrome_path = None
-                
-                if self.chrome_path and os.path.exists(self.chrome_path):
-                    chrome_path = self.chrome_path
-                    logger.info(f"Using user-configured Chrome browser at: {chrome_path}")
-                else:
-                    # Look for Chrome in common locations
-                    possible_paths = [
-                        r"C:\Program Files\Google\Chrome\Application\chrome.exe",
-                        r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
-                        r"C:\Users\%USERNAME%\AppData\Local\Google\Chrome\Application\chrome.exe"
-                    ]
-                    
-                    for path in possible_paths:
-                        if os.path.exists(os.path.expandvars(path)):
-                            chrome_path = os.path.expandvars(path)
-                            break
-                
-                if chrome_path:
-                    logger.info(f"Chrome found at: {chrome_path}")
-                    chrome_options.binary_location = chrome_path
-                else:
-                    logger.warning("Chrome not found! Please set browser_path in config.ini.")
-                    # Try to proceed with default binary location
-            except Exception as ce:
-                logger.warning(f"Could not verify Chrome installation: {str(ce)}")
-            
-            # Check for local chromedriver in chrome_driver folder
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            driver_dir = os.path.join(base_dir, "chrome_driver")
-            driver_path = os.path.join(driver_dir, "chromedriver.exe")
-            
-            # Create chrome_driver directory if it doesn't exist
-            os.makedirs(driver_dir, exist_ok=True)
-            
-            # Check if chromedriver exists in the chrome_driver folder
-            if os.path.exists(driver_path):
-                logger.info(f"Using ChromeDriver from: {driver_path}")
-                service = Service(executable_path=driver_path)
-            else:
-                # Check alternate locations
-                alternate_paths = [
-                    os.path.join(base_dir, "chromedriver.exe"),
-                    os.path.join(base_dir, "drivers", "chromedriver.exe")
-                ]
-                
-                driver_found = False
-                for alt_path in alternate_paths:
-                    if os.path.exists(alt_path):
-                        logger.info(f"Using ChromeDriver from: {alt_path}")
-                        service = Service(executable_path=alt_path)
-                        driver_found = True
-                        break
-                        
-                if not driver_found:
-                    # Try using webdriver_manager as a last resort
-                    try:
-                        logger.info("Trying to use webdriver_manager...")
-                        from webdriver_manager.chrome import ChromeDriverManager
-                        driver_path = ChromeDriverManager().install()
-                        logger.info(f"ChromeDriver installed at: {driver_path}")
-                        service = Service(executable_path=driver_path)
-                        driver_found = True
-                    except Exception as e:
-                        logger.warning(f"webdriver_manager failed: {str(e)}")
-                        
-                if not driver_found:
-                    error_msg = (
-                        "ChromeDriver not found. Please download the correct ChromeDriver version for your Chrome from\n"
-                        "https://chromedriver.chromium.org/downloads\n"
-                        f"and place chromedriver.exe in the {driver_dir} folder."
-                    )
-                    logger.error(error_msg)
-                    raise Exception(error_msg)
-            
+            self.profile.apply_options(chrome_options)
+
+            # CDP performance log lets the readiness wait track network activity
+            chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+            chrome_path, driver_path = self._resolve_paths()
+            if chrome_path:
+                chrome_options.binary_location = chrome_path
+
             # Initialize Chrome driver with configured service
-            self.browser = webdriver.Chrome(service=service, options=chrome_options)
+            try:
+                self.browser = webdriver.Chrome(
+                    service=Service(executable_path=driver_path), options=chrome_options
+                )
+            except Exception:
+                # Paths may be outdated after a Chrome update, look them up again next time
+                with _resolve_lock:
+                    _resolved_paths.clear()
+                raise
             self.browser.set_page_load_timeout(self.browser_timeout)
+            self.base_handle = self.browser.current_window_handle
+            self.profile.setup(self.browser)
+            self.healthy = True
 
             logger.info("Browser initialized successfully.")
             return True
@@ -248,23 +284,72 @@ class SeleniumCrawler:
                 logger.error(f"Error closing browser: {str(e)}")
             finally:
                 self.browser = None
+                self.base_handle = None
+
+    def _open_tab(self):
+        """Switch to a new tab for the next page, with request blocking set up for it"""
+        self.browser.switch_to.new_window("tab")
+        self.profile.setup(self.browser)
+
+    def _close_tab(self):
+        """Close the page's tab and go back to the browser's first tab"""
+        try:
+            if len(self.browser.window_handles) > 1:
+                self.browser.close()
+            self.browser.switch_to.window(self.base_handle)
+        except Exception as e:
+            logger.warning(f"Error closing tab: {str(e)}")
+
+    def _browser_alive(self):
+        """Check whether the browser process still answers after an error in a tab"""
+        try:
+            return bool(self.browser.window_handles)
+        except Exception:
+            return False
 
     def crawl_url(self, url):
         """Crawl a URL and return the page content"""
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+
+        self.last_error = None
         if not self.browser and not self._initialize_browser():
+            self.last_error = "webdriver"
             return None
 
+        tab_opened = False
         try:
+            if self.fresh_tab:
+                self._open_tab()
+                tab_opened = True
+
             logger.info(f"Crawling URL: {url}")
-            self.browser.get(url)
+            if self.wait_strategy == "readiness":
+                # Discard log entries left over from the previous page
+                ReadinessWaiter.drain_performance_log(self.browser)
+
+            self.profile.before_navigation(self.browser, url)
+            with NAVIGATION.time():
+                self.browser.get(url)
 
             # Wait for page to load
-            logger.info(f"Waiting {self.sleep_time} seconds for page to load...")
-            time.sleep(self.sleep_time)
+            if self.wait_strategy == "readiness":
+                wait_timings = self.readiness.wait(self.browser, url)
+                logger.info(
+                    f"Page ready after {wait_timings['total_seconds']}s "
+                    f"(readyState {wait_timings['ready_state_seconds']}s, "
+                    f"network {wait_timings['network_idle_seconds']}s, "
+                    f"DOM {wait_timings['dom_stable_seconds']}s)"
+                )
+            else:
+                logger.info(f"Waiting {self.sleep_time} seconds for page to load...")
+                time.sleep(self.sleep_time)
+                wait_timings = {"total_seconds": self.sleep_time, "document": None}
+            READINESS_WAIT.observe(wait_timings["total_seconds"])
 
             # Get page data
             page_title = self.browser.title
             page_html = self.browser.page_source
+            PAGE_SOURCE_BYTES.observe(len(page_html.encode("utf-8")), tier="browser")
 
             # Try to get meta description
             try:
@@ -280,6 +365,7 @@ class SeleniumCrawler:
                 except:
                     page_description = f"Description for {page_title}"
 
+            self.pages_crawled += 1
             logger.info(f"Successfully crawled: {url}")
             logger.info(f"Title: {page_title}")
 
@@ -288,6 +374,7 @@ class SeleniumCrawler:
                 "title": page_title,
                 "description": page_description,
                 "html": page_html,
+                "wait_timings": wait_timings,
             }
 
         except TimeoutException:
@@ -295,10 +382,16 @@ class SeleniumCrawler:
             return None
         except WebDriverException as e:
             logger.error(f"WebDriver error: {str(e)}")
-            # Try to reinitialize browser
-            self.close_browser()
-            self._initialize_browser()
+            self.error_count += 1
+            self.last_error = "webdriver"
+            # A crashed tab is simply closed, only a dead browser is dropped and restarted
+            if not (tab_opened and self._browser_alive()):
+                self.healthy = False
+                self.close_browser()
             return None
         except Exception as e:
             logger.error(f"Error crawling {url}: {str(e)}")
             return None
+        finally:
+            if tab_opened and self.browser:
+                self._close_tab()
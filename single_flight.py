@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Deduplicate concurrent work by key: the first caller runs it, later callers share its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.joined = 0
+
+    def begin(self, key):
+        """Return (future, leader); only the leader runs the work and must call finish"""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.joined += 1
+                return future, False
+            future = Future()
+            # A running future cannot be cancelled by one caller giving up waiting
+            future.set_running_or_notify_cancel()
+            self._flights[key] = future
+            return future, True
+
+    def finish(self, key, result=None, error=None):
+        """Publish the leader's result or error to every waiting caller"""
+        with self._lock:
+            future = self._flights.pop(key, None)
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn once per key at a time, blocking callers that join an in-flight run"""
+        future, leader = self.begin(key)
+        if not leader:
+            return future.result()
+
+        result, error = None, None
+        try:
+            result = fn(*args, **kwargs)
+            return result
+        except BaseException as e:
+            # Followers get an ordinary error when the leader is cancelled or interrupted
+            error = e if isinstance(e, Exception) else RuntimeError(f"{key} was interrupted")
+            raise
+        finally:
+            # Always resolve waiting callers and drop the key, whatever stopped the leader
+            self.finish(key, result=result, error=error)
+
+    def stats(self):
+        """Get the number of running flights and callers that joined one"""
+        with self._lock:
+            return {"in_flight": len(self._flights), "joined": self.joined}
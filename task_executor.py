@@ -0,0 +1,154 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+from metrics import EXECUTOR_QUEUE_WAIT
+
+
+class ExecutorBusy(Exception):
+    """Raised when an executor already has its maximum number of queued tasks"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} executor is busy, retry in {retry_after} seconds")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """Thread pool with a hard limit on running plus queued tasks"""
+
+    def __init__(self, name, max_workers, max_queue):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=name
+        )
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+        # Moving average of task duration, used to estimate Retry-After
+        self._avg_duration = 1.0
+
+    def _run_timed(self, fn, args, kwargs, submitted):
+        """Run a task and fold its duration into the moving average"""
+        started = time.monotonic()
+        EXECUTOR_QUEUE_WAIT.observe(started - submitted, executor=self.name)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            duration = time.monotonic() - started
+            with self._lock:
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+
+    def _task_done(self, _future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def retry_after(self):
+        """Estimate in seconds until a queue slot frees up"""
+        with self._lock:
+            waves = max(1, self._pending // self.max_workers)
+            return max(1, int(round(self._avg_duration * waves)))
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit a task or raise ExecutorBusy when the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            retry_after = self.retry_after()
+            logger.warning(f"{self.name} executor queue full, rejecting task")
+            raise ExecutorBusy(self.name, retry_after)
+
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(
+                self._run_timed, fn, args, kwargs, time.monotonic()
+            )
+        except Exception:
+            self._task_done(None)
+            raise
+        future.add_done_callback(self._task_done)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a task on the executor and await its result from the event loop"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self):
+        """Get queue depth information"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "queued": max(0, self._pending - self.max_workers),
+                "rejected": self._rejected,
+                "avg_task_seconds": round(self._avg_duration, 3),
+            }
+
+    def shutdown(self, wait=False):
+        """Stop accepting tasks and release worker threads"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class DelayedCalls:
+    """Calls functions after a delay from one timer thread, instead of one sleeping thread per call"""
+
+    def __init__(self, name):
+        self.name = name
+        self._heap = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def call_later(self, delay, fn, *args, **kwargs):
+        """Schedule fn(*args, **kwargs) to run after delay seconds"""
+        with self._condition:
+            if self._stopped:
+                return
+            heapq.heappush(
+                self._heap,
+                (time.monotonic() + max(0, delay), next(self._order), fn, args, kwargs),
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopped:
+                        return
+                    now = time.monotonic()
+                    if self._heap and self._heap[0][0] <= now:
+                        _, _, fn, args, kwargs = heapq.heappop(self._heap)
+                        break
+                    self._condition.wait(self._heap[0][0] - now if self._heap else None)
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Error in delayed call on {self.name}: {str(e)}")
+
+    def pending(self):
+        """Number of calls waiting for their time"""
+        with self._condition:
+            return len(self._heap)
+
+    def shutdown(self):
+        """Drop every waiting call and stop the timer thread"""
+        with self._condition:
+            self._stopped = True
+            self._heap.clear()
+            self._condition.notify()
@@ -0,0 +1,109 @@
+"""Shared setup: every module reads config.ini from the working directory when
+imported, so the tests run from a throwaway directory with their own config
+and database, set up before test modules are collected and removed afterwards."""
+import os
+import shutil
+import sys
+import tempfile
+import configparser
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Settings written over the repository config.ini in the test working directory
+TEST_CONFIG = {
+    "scheduler": {"respect_robots": "false"},
+    "crawler": {"warm_spare": "false"},
+    "profile": {"blocklist_file": os.path.join(REPO_DIR, "blocklist.txt")},
+    "refresher": {"enabled": "false"},
+    "server": {"prewarm_browsers": "0", "prewarm_cleaner": "false"},
+}
+
+
+_previous_cwd = None
+_workdir = None
+
+
+def pytest_configure(config):
+    """Switch to a working directory with the test config before any test module is imported"""
+    global _previous_cwd, _workdir
+    _workdir = tempfile.mkdtemp(prefix="crawler-tests-")
+    settings = configparser.ConfigParser()
+    settings.read(os.path.join(REPO_DIR, "config.ini"))
+    for section, values in TEST_CONFIG.items():
+        if not settings.has_section(section):
+            settings.add_section(section)
+        for key, value in values.items():
+            settings.set(section, key, value)
+    with open(os.path.join(_workdir, "config.ini"), "w", encoding="utf-8") as f:
+        settings.write(f)
+
+    _previous_cwd = os.getcwd()
+    os.chdir(_workdir)
+    sys.path.insert(0, REPO_DIR)
+
+    from log_setup import setup_logging
+
+    setup_logging(level="WARNING", log_file=False)
+
+
+def pytest_unconfigure(config):
+    """Close the test database and remove the working directory"""
+    database = sys.modules.get("database")
+    if database is not None:
+        database.engine.dispose()
+    if _previous_cwd is not None:
+        os.chdir(_previous_cwd)
+    if _workdir is not None:
+        shutil.rmtree(_workdir, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    """An initialized database with empty tables, page cache and read counts"""
+    import database
+
+    database.init_db(migrate_html=False)
+    with database.engine.begin() as conn:
+        for table in reversed(database.Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    if database.page_cache:
+        database.page_cache.clear()
+    # Reads counted by earlier tests would land on reused page ids
+    database.access_counter.take()
+    return database
+
+
+@pytest.fixture
+def client(db):
+    """Test client for the API"""
+    from fastapi.testclient import TestClient
+    import api
+
+    return TestClient(api.app)
+
+
+@pytest.fixture
+def numbered_pages(db):
+    """Ids of 7 stored pages, oldest first"""
+    ids = []
+    for number in range(7):
+        url = db.save_crawled_page(
+            f"https://example.com/page-{number}",
+            f"Page {number}",
+            f"Description {number}",
+            f"Content   of\n page {number}",
+            article(f"Page {number}", f"Content of page {number}"),
+        )
+        ids.append(db.get_crawled_page(url)["id"])
+    return ids
+
+
+def article(title, body, canonical=None):
+    """HTML of a simple article page"""
+    link = f'<link rel="canonical" href="{canonical}">' if canonical else ""
+    return (
+        f"<html><head><title>{title}</title>{link}</head>"
+        f"<body><article><p>{body}</p></article></body></html>"
+    )
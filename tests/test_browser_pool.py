@@ -0,0 +1,69 @@
+"""Browser pool shutdown and warm spare handling"""
+import threading
+
+import browser_pool
+from browser_pool import BrowserPool
+
+
+class FakeCrawler:
+    """Stands in for SeleniumCrawler, a started browser is just a flag"""
+
+    started = []
+    gate = None
+
+    def __init__(self):
+        self.browser = None
+        self.healthy = True
+        self.pages_crawled = 0
+        self.error_count = 0
+
+    def _initialize_browser(self):
+        if FakeCrawler.gate:
+            FakeCrawler.gate.wait(5)
+        self.browser = object()
+        FakeCrawler.started.append(self)
+        return True
+
+    def close_browser(self):
+        self.browser = None
+
+
+def _pool(monkeypatch):
+    FakeCrawler.started = []
+    FakeCrawler.gate = None
+    monkeypatch.setattr(browser_pool, "SeleniumCrawler", FakeCrawler)
+    pool = BrowserPool(size=1)
+    pool.warm_spare = True
+    return pool
+
+
+def _running_browsers():
+    return [crawler for crawler in FakeCrawler.started if crawler.browser is not None]
+
+
+def test_spare_finishing_after_close_is_quit(monkeypatch):
+    pool = _pool(monkeypatch)
+    FakeCrawler.gate = threading.Event()
+    pool._start_spare()
+    pool.close_all()
+
+    FakeCrawler.gate.set()
+    for thread in threading.enumerate():
+        if thread.name == "browser-spare":
+            thread.join(5)
+
+    assert pool._spare is None
+    assert _running_browsers() == []
+
+
+def test_release_after_close_starts_nothing(monkeypatch):
+    pool = _pool(monkeypatch)
+    crawler = pool.checkout(timeout=0)
+    crawler._initialize_browser()
+    pool.close_all()
+
+    # The crawl that was running during close returns its browser afterwards
+    pool.release(crawler)
+
+    assert not pool._warming
+    assert _running_browsers() == []
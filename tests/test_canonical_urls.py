@@ -0,0 +1,130 @@
+"""URL canonicalization, canonical links and the alias table"""
+from datetime import datetime, timedelta
+
+from conftest import article
+from url_canonicalizer import canonicalize_url, resolve_canonical
+
+
+def test_canonicalize_url_merges_variants():
+    assert canonicalize_url("HTTP://Example.COM:80/a/?utm_source=x&b=2&a=1#top") == (
+        "http://example.com/a?a=1&b=2"
+    )
+    assert canonicalize_url("https://example.com") == "https://example.com/"
+    # Hash-bang routes are kept
+    assert canonicalize_url("https://example.com/#!/page") == "https://example.com/#!/page"
+
+
+def test_resolve_canonical_follows_same_site_links():
+    assert resolve_canonical("https://example.com/a?page=1", "/a") == "https://example.com/a"
+    assert resolve_canonical("https://www.example.com/a", "https://example.com/b") == (
+        "https://example.com/b"
+    )
+
+
+def test_resolve_canonical_rejects_unsafe_targets():
+    url = "https://example.com/news/article.html"
+    assert resolve_canonical(url, "https://other.com/article") == url
+    assert resolve_canonical(url, "/") == url
+    assert resolve_canonical(url, "https://example.com") == url
+    assert resolve_canonical(url, "/news/x", holds_other_page=lambda target: True) == url
+    assert resolve_canonical(url, "/news/x", holds_other_page=lambda target: False) == (
+        "https://example.com/news/x"
+    )
+
+
+def _crawl(url, title, body, canonical=None):
+    from crawl_service import process_and_save
+
+    return process_and_save({"url": url, "html": article(title, body, canonical)})
+
+
+def test_articles_pointing_at_the_home_page_keep_their_own_rows(db):
+    _crawl("https://example.com/a/article.html", "Artikel satu", "Isi satu", canonical="/")
+    _crawl("https://example.com/a/third.html", "Artikel tiga", "Isi tiga", canonical="/")
+
+    assert db.get_crawled_page("https://example.com/a/article.html")["title"] == "Artikel satu"
+    assert db.get_crawled_page("https://example.com/a/third.html")["title"] == "Artikel tiga"
+    assert db.get_crawled_page("https://example.com/") is None
+
+
+def test_canonical_holding_another_page_is_not_overwritten(db):
+    _crawl("https://example.com/story", "Story", "Original story")
+    saved = _crawl("https://example.com/other", "Other", "Different page", canonical="/story")
+
+    assert saved["url"] == "https://example.com/other"
+    assert db.get_crawled_page("https://example.com/story")["content"] == "Original story"
+    assert db.get_crawled_page("https://example.com/other")["content"] == "Different page"
+
+
+def test_variants_become_aliases_and_can_update_their_page(db):
+    saved = _crawl("https://example.com/story?amp=1", "Story", "Version one", canonical="/story")
+    assert saved["url"] == "https://example.com/story"
+
+    # The same variant with changed content still updates the canonical page
+    _crawl("https://example.com/story?amp=1", "Story", "Version two", canonical="/story")
+    assert db.get_crawled_page("https://example.com/story?amp=1")["content"] == "Version two"
+    assert db.get_crawled_page("https://example.com/story")["content"] == "Version two"
+
+
+def _stored_urls(db):
+    session = db.get_session()
+    try:
+        return {page.url: page for page in session.query(db.CrawledPage)}
+    finally:
+        session.close()
+
+
+def test_variant_row_is_merged_when_its_alias_is_recorded(db):
+    # The variant was stored on its own before the page declared its canonical URL
+    _crawl("https://example.com/story?amp=1", "Story", "Same body")
+    db.lookup_page("https://example.com/story?amp=1")
+    db.flush_access_counts()
+
+    _crawl("https://example.com/story?amp=1", "Story", "Same body", canonical="/story")
+
+    pages = _stored_urls(db)
+    assert set(pages) == {"https://example.com/story"}
+    # Reads of the variant count for the canonical page
+    assert pages["https://example.com/story"].access_count == 1
+    assert db.get_crawled_page("https://example.com/story?amp=1")["url"] == (
+        "https://example.com/story"
+    )
+
+
+def test_variant_of_a_stored_page_keeps_its_row_when_content_differs(db):
+    _crawl("https://example.com/story?amp=1", "Story", "Same body")
+    _crawl("https://example.com/story", "Story", "Same body")
+    _crawl("https://example.com/story?amp=1", "Story", "Same body", canonical="/story")
+
+    assert set(_stored_urls(db)) == {
+        "https://example.com/story?amp=1",
+        "https://example.com/story",
+    }
+
+
+def test_migration_merges_rows_stored_under_aliases(db):
+    _crawl("https://example.com/story?amp=1", "Story", "Same body")
+    _crawl("https://example.com/story", "Story", "Same body")
+    session = db.get_session()
+    try:
+        session.add(
+            db.UrlAlias(alias="https://example.com/story?amp=1", url="https://example.com/story")
+        )
+        session.commit()
+    finally:
+        session.close()
+
+    db.canonicalize_stored_urls()
+    assert set(_stored_urls(db)) == {"https://example.com/story"}
+
+
+def test_pages_due_are_refetched_from_their_original_url(db):
+    original = "https://example.com/list/?b=2&a=1"
+    _crawl(original, "List", "Listing")
+    # Only pages read since their crawl are due
+    db.lookup_page(original)
+    db.flush_access_counts()
+
+    rows = db.get_pages_due(datetime.now() + timedelta(seconds=1), 10)
+    assert [url for url, _ in rows] == [original]
+    assert db.get_crawled_page(original)["url"] == "https://example.com/list?a=1&b=2"
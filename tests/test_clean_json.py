@@ -0,0 +1,26 @@
+"""Bulk page lookups of /api/get-clean-json"""
+
+
+def test_clean_json_keeps_request_order(client, numbered_pages):
+    pages = numbered_pages
+    ids = [pages[5], 999999, pages[0], pages[3]]
+    body = client.post("/api/get-clean-json", json={"ids": ids}).json()
+
+    assert [page["title"] for page in body] == ["Page 5", "Page 0", "Page 3"]
+    assert body[0]["content"] == "Content of page 5"
+    assert "html" not in body[0]
+
+
+def test_large_selections_are_streamed(client, numbered_pages, monkeypatch):
+    import api
+
+    monkeypatch.setattr(api, "STREAM_JSON_THRESHOLD", 2)
+    response = client.post("/api/get-clean-json", json={"ids": numbered_pages})
+    assert [page["title"] for page in response.json()] == [f"Page {n}" for n in range(7)]
+
+
+def test_iter_pages_by_ids_chunks_keep_order(db, numbered_pages):
+    pages = numbered_pages
+    ids = list(reversed(pages)) + [pages[0]]
+    titles = [page["title"] for page in db.iter_pages_by_ids(ids, ["title"], chunk_size=2)]
+    assert titles == [f"Page {number}" for number in range(6, -1, -1)] + ["Page 0"]
@@ -0,0 +1,137 @@
+"""Per-host politeness: token buckets, concurrency caps, backoff and job requeueing"""
+import asyncio
+import time
+
+import pytest
+
+from crawl_scheduler import CrawlScheduler, HostThrottled
+from task_executor import ExecutorBusy, DelayedCalls
+
+
+def _scheduler(min_delay=1.0, burst=1, max_per_host=1, max_wait=5):
+    scheduler = CrawlScheduler()
+    scheduler.enabled = True
+    scheduler.respect_robots = False
+    scheduler.min_delay = min_delay
+    scheduler.burst = burst
+    scheduler.max_per_host = max_per_host
+    scheduler.max_wait = max_wait
+    return scheduler
+
+
+def test_try_acquire_never_waits():
+    scheduler = _scheduler(min_delay=10)
+    assert scheduler.try_acquire("https://slow.com/1") == 0
+    scheduler.release("https://slow.com/1")
+
+    started = time.monotonic()
+    wait = scheduler.try_acquire("https://slow.com/2")
+    assert time.monotonic() - started < 0.1
+    assert 9 < wait <= 10
+    # Other hosts are not held up by the slow one
+    assert scheduler.try_acquire("https://fast.com/1") == 0
+
+
+def test_concurrency_cap_is_per_host():
+    scheduler = _scheduler(min_delay=0, burst=5, max_per_host=1)
+    assert scheduler.try_acquire("https://a.com/1") == 0
+    assert scheduler.try_acquire("https://a.com/2") > 0
+    scheduler.release("https://a.com/1")
+    assert scheduler.try_acquire("https://a.com/2") == 0
+
+
+def test_backing_off_host_raises_host_throttled():
+    scheduler = _scheduler(min_delay=0.01, max_wait=5)
+    scheduler.record("https://busy.com/", 429, {"Retry-After": "60"})
+
+    with pytest.raises(HostThrottled) as raised:
+        scheduler.try_acquire("https://busy.com/page")
+    error = raised.value
+    assert isinstance(error, ExecutorBusy)
+    assert error.name == "busy.com"
+    assert error.retry_after >= 55
+    assert "busy.com is rate limited" in str(error)
+
+
+def test_async_slot_waits_on_the_event_loop():
+    scheduler = _scheduler(min_delay=0.2, burst=1)
+
+    async def crawl_twice():
+        started = time.monotonic()
+        async with scheduler.async_slot("https://a.com/1"):
+            pass
+        async with scheduler.async_slot("https://a.com/2"):
+            pass
+        return time.monotonic() - started
+
+    assert 0.15 < asyncio.run(crawl_twice()) < 1
+
+
+def test_async_slot_gives_up_after_max_wait():
+    scheduler = _scheduler(min_delay=30, max_wait=0.5)
+
+    async def crawl_twice():
+        async with scheduler.async_slot("https://a.com/1"):
+            pass
+        async with scheduler.async_slot("https://a.com/2"):
+            pass
+
+    with pytest.raises(HostThrottled):
+        asyncio.run(crawl_twice())
+
+
+def test_disabled_scheduler_always_allows():
+    scheduler = _scheduler(min_delay=30)
+    scheduler.enabled = False
+    for _ in range(3):
+        assert scheduler.try_acquire("https://a.com/") == 0
+
+
+def test_interleave_spreads_hosts():
+    urls = ["https://a.com/1", "https://a.com/2", "https://a.com/3", "https://b.com/1"]
+    assert CrawlScheduler.interleave(urls) == [
+        "https://a.com/1",
+        "https://b.com/1",
+        "https://a.com/2",
+        "https://a.com/3",
+    ]
+
+
+def test_delayed_calls_run_in_order():
+    calls = DelayedCalls("test-delayed")
+    seen = []
+    calls.call_later(0.1, seen.append, "late")
+    calls.call_later(0.0, seen.append, "early")
+    deadline = time.monotonic() + 2
+    while len(seen) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    calls.shutdown()
+    assert seen == ["early", "late"]
+
+
+def test_busy_host_does_not_hold_job_workers(db, monkeypatch):
+    import crawl_jobs
+    import crawl_service
+    from conftest import article
+
+    scheduler = _scheduler(min_delay=0.3, burst=1, max_per_host=1)
+    monkeypatch.setattr(crawl_jobs, "crawl_scheduler", scheduler)
+
+    def fetch(url, slot_held=False):
+        assert slot_held
+        return {"url": url, "html": article(url, f"Content of {url}")}
+
+    monkeypatch.setattr(crawl_service, "fetch_page", fetch)
+
+    urls = [f"https://slow.com/{number}" for number in range(4)] + ["https://fast.com/1"]
+    job_id = crawl_jobs.start_job(urls)
+    deadline = time.monotonic() + 10
+    while db.get_crawl_job(job_id, include_items=False)["status"] == "running":
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+    job = db.get_crawl_job(job_id)
+    assert job["counts"] == {"done": 5}
+    finished = {item["url"]: item["updated_at"] for item in job["items"]}
+    # The fast host is done long before the slow host's paced items
+    assert finished["https://fast.com/1"] < finished["https://slow.com/3"]
@@ -0,0 +1,32 @@
+"""Streaming NDJSON export of /api/export"""
+import json
+
+
+def _ids(response):
+    return [json.loads(line)["id"] for line in response.text.splitlines()]
+
+
+def test_export_streams_oldest_first(client, numbered_pages):
+    response = client.get("/api/export", params={"fields": "url"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == numbered_pages
+    assert set(rows[0]) == {"id", "url", "last_crawled_at"}
+
+
+def test_export_resumes_after_the_last_row(client, numbered_pages):
+    rows = [json.loads(line) for line in client.get("/api/export").text.splitlines()]
+
+    last = rows[3]
+    resumed = client.get(
+        "/api/export",
+        params={"fields": "url", "since": last["last_crawled_at"], "after_id": last["id"]},
+    )
+    assert _ids(resumed) == numbered_pages[4:]
+
+
+def test_export_can_be_gzipped(client, numbered_pages):
+    response = client.get("/api/export", params={"gzip": "true"})
+    assert response.headers["content-encoding"] == "gzip"
+    # The client decodes the gzip body
+    assert _ids(response) == numbered_pages
@@ -0,0 +1,17 @@
+from html_cleaner import HtmlCleaner
+
+PAGE = """<html><head><title>T</title><style>p {}</style></head><body>
+<nav><article>Menu menu menu menu menu menu menu menu</article></nav>
+<article><p>Main <b>story</b> text</p><script>track()</script>
+<div style="display: none"><p>Hidden teaser</p></div>
+<aside>Related</aside><p>ends here</p></article>
+<footer>Footer</footer></body></html>"""
+
+
+def test_removed_and_hidden_elements_are_left_out():
+    assert HtmlCleaner.clean_html(PAGE) == "Main story text ends here"
+
+
+def test_body_is_used_without_a_content_container():
+    html = '<body><p>Plain</p><span style="display:none">x</span><nav>n</nav> page</body>'
+    assert HtmlCleaner.clean_html(html) == "Plain page"
@@ -0,0 +1,50 @@
+from page_cache import PageCache
+
+
+def test_read_started_before_a_write_is_not_cached():
+    cache = PageCache(max_entries=10)
+    generation = cache.generation("k")
+    # A write lands between the reader's database read and its put
+    cache.invalidate("k")
+    cache.put("k", "old", generation=generation)
+    assert cache.get("k") is None
+
+    cache.put("k", "new", generation=cache.generation("k"))
+    assert cache.get("k") == "new"
+
+
+def test_forgotten_stamps_still_refuse_older_reads():
+    cache = PageCache(max_entries=2)
+    generation = cache.generation("k")
+    cache.invalidate("k")
+    for other in ("a", "b", "c"):
+        cache.invalidate(other)
+    cache.put("k", "old", generation=generation)
+    assert cache.get("k") is None
+
+
+def test_clear_refuses_reads_started_before_it():
+    cache = PageCache(max_entries=10)
+    generation = cache.generation("k")
+    cache.clear()
+    cache.put("k", "old", generation=generation)
+    assert cache.get("k") is None
+
+
+def test_lookup_does_not_cache_a_page_overwritten_meanwhile(db, monkeypatch):
+    url = "https://example.com/story"
+    db.save_crawled_page(url, "Old", "", "Old content", "<p>old</p>")
+    read_page = db.CrawledPage.to_dict
+
+    def to_dict_then_write(page, *args, **kwargs):
+        result = read_page(page, *args, **kwargs)
+        monkeypatch.setattr(db.CrawledPage, "to_dict", read_page)
+        db.save_crawled_page(url, "New", "", "New content", "<p>new</p>")
+        return result
+
+    monkeypatch.setattr(db.CrawledPage, "to_dict", to_dict_then_write)
+    page, _ = db.lookup_page(url)
+    assert page["title"] == "Old"
+
+    page, _ = db.lookup_page(url)
+    assert page["title"] == "New"
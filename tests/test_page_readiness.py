@@ -0,0 +1,27 @@
+import configparser
+import time
+
+from page_readiness import ReadinessWaiter
+
+
+class BusyPage:
+    """Browser stub for a page whose DOM never stops changing"""
+
+    def execute_script(self, script):
+        return "interactive" if "readyState" in script else 0
+
+    def get_log(self, kind):
+        return []
+
+
+def test_dom_quiet_wait_is_capped():
+    config = configparser.ConfigParser()
+    config.read_dict({"readiness": {"dom_quiet_timeout": "0.3", "network_idle_ms": "0"}})
+    waiter = ReadinessWaiter(config, timeout=30)
+
+    started = time.monotonic()
+    timings = waiter.wait(BusyPage(), "https://example.com/")
+
+    assert timings["ready_state"]
+    assert not timings["dom_stable"]
+    assert time.monotonic() - started < 2
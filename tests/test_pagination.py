@@ -0,0 +1,32 @@
+"""Keyset cursors and column projection of /api/pages"""
+import pytest
+
+
+def test_cursor_pages_through_every_row_newest_first(client, numbered_pages):
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/pages", params=params).json()
+        assert body["success"]
+        assert body["count"] <= 3
+        seen.extend(page["id"] for page in body["pages"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == list(reversed(numbered_pages))
+
+
+def test_fields_limit_the_returned_columns(client, numbered_pages):
+    body = client.get("/api/pages", params={"fields": "title", "limit": 1}).json()
+    assert set(body["pages"][0]) == {"id", "title", "last_crawled_at"}
+
+
+@pytest.mark.parametrize(
+    "params", [{"fields": "title,secret"}, {"cursor": "not-a-cursor"}]
+)
+def test_bad_parameters_are_rejected(client, numbered_pages, params):
+    response = client.get("/api/pages", params=params)
+    assert response.status_code == 400
+    assert not response.json()["success"]
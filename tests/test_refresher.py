@@ -0,0 +1,41 @@
+"""Selection of pages the refresher re-crawls before they go stale"""
+from datetime import datetime, timedelta
+
+
+def _age(db, url, crawled_days_ago, read_days_ago=None, reads=0):
+    """Backdate a stored page's crawl and give it reads"""
+    now = datetime.now()
+    read_at = now - timedelta(days=read_days_ago) if read_days_ago is not None else None
+    with db.engine.begin() as conn:
+        conn.execute(
+            db.CrawledPage.__table__.update()
+            .where(db.CrawledPage.url == url)
+            .values(
+                last_crawled_at=now - timedelta(days=crawled_days_ago),
+                last_accessed_at=read_at,
+                access_count=reads,
+            )
+        )
+
+
+def test_only_pages_read_since_their_crawl_are_due(db):
+    for name in ("read", "unread", "read-before-crawl"):
+        db.save_crawled_page(f"https://example.com/{name}", name, "", "x", "<p>x</p>")
+    _age(db, "https://example.com/read", 100, read_days_ago=1, reads=3)
+    _age(db, "https://example.com/unread", 100)
+    _age(db, "https://example.com/read-before-crawl", 100, read_days_ago=200, reads=50)
+
+    due = db.get_pages_due(datetime.now(), 10)
+    assert [url for url, _ in due] == ["https://example.com/read"]
+
+
+def test_access_counts_decay(db):
+    db.save_crawled_page("https://example.com/hot", "hot", "", "x", "<p>x</p>")
+    db.save_crawled_page("https://example.com/warm", "warm", "", "x", "<p>x</p>")
+    _age(db, "https://example.com/hot", 100, read_days_ago=1, reads=9)
+    _age(db, "https://example.com/warm", 100, read_days_ago=1, reads=1)
+
+    db.decay_access_counts(0.5)
+
+    due = db.get_pages_due(datetime.now(), 10)
+    assert due == [("https://example.com/hot", 4)]
@@ -0,0 +1,41 @@
+"""Rebuilding page content from stored HTML"""
+from conftest import article
+
+
+def _store(db, name, body):
+    url = db.save_crawled_page(
+        f"https://example.com/{name}", name, "", "Old content", article(name, body)
+    )
+    return db.get_crawled_page(url)["id"]
+
+
+def test_pages_are_rebuilt_from_their_html(db):
+    import reprocess
+
+    page_id = _store(db, "kept", "Rebuilt content")
+    result = reprocess.reprocess_pages(workers=1, chunk_size=1)
+
+    assert result["processed"] == 1
+    assert next(db.iter_pages_by_ids([page_id], ["content"]))["content"] == "Rebuilt content"
+
+
+def test_pages_without_html_keep_their_content(db):
+    import reprocess
+
+    page_id = _store(db, "lost", "Rebuilt content")
+    with db.engine.begin() as conn:
+        conn.execute(db.CrawledPage.__table__.update().values(html=None, html_hash=None))
+
+    result = reprocess.reprocess_pages(workers=1)
+
+    assert result == {**result, "processed": 0, "failed": 0, "skipped": 1}
+    assert next(db.iter_pages_by_ids([page_id], ["content"]))["content"] == "Old content"
+
+
+def test_id_selections_are_loaded_in_slices(db):
+    import reprocess
+
+    ids = [_store(db, f"page-{number}", f"Body {number}") for number in range(5)]
+    chunks = list(reprocess._iter_chunks(2, ids=list(reversed(ids)) + [999999]))
+
+    assert [[row[0] for row in rows] for rows in chunks] == [ids[:2], ids[2:4], ids[4:]]
@@ -0,0 +1,72 @@
+"""Full-text search of /api/pages and the dashboard: ranking, snippets and counts"""
+import pytest
+
+from conftest import article
+
+
+@pytest.fixture
+def pages(db):
+    """Stored pages keyed by a short name"""
+    texts = {
+        "title": ("Resep rendang padang", "Masakan daging dengan santan"),
+        "content": ("Kuliner Sumatra", "Rendang adalah masakan daging khas Minang"),
+        "other": ("Berita cuaca", "Hujan deras diperkirakan turun sore ini"),
+    }
+    ids = {}
+    for name, (title, body) in texts.items():
+        url = db.save_crawled_page(
+            f"https://example.com/{name}", title, "", body, article(title, body)
+        )
+        ids[name] = db.get_crawled_page(url)["id"]
+    return ids
+
+
+def test_title_matches_rank_first(client, pages):
+    body = client.get("/api/pages", params={"q": "rendang"}).json()
+    assert [page["id"] for page in body["pages"]] == [pages["title"], pages["content"]]
+
+
+def test_results_carry_highlighted_snippets(client, pages):
+    body = client.get("/api/pages", params={"q": "minang"}).json()
+    assert body["count"] == 1
+    assert "<mark>Minang</mark>" in body["pages"][0]["snippet"]
+
+
+def test_last_word_matches_as_prefix(client, pages):
+    body = client.get("/api/pages", params={"q": "ren"}).json()
+    assert body["count"] == 2
+
+
+def test_search_pages_are_cursor_paginated(client, pages):
+    first = client.get("/api/pages", params={"q": "daging", "limit": 1}).json()
+    second = client.get(
+        "/api/pages", params={"q": "daging", "limit": 1, "cursor": first["next_cursor"]}
+    ).json()
+    assert second["next_cursor"] is None
+    assert {first["pages"][0]["id"], second["pages"][0]["id"]} == {
+        pages["title"],
+        pages["content"],
+    }
+
+
+def test_unranked_search_counts_matches(db, pages):
+    session = db.get_session()
+    try:
+        query = session.query(db.CrawledPage)
+        assert db.apply_search(query, "daging", ranked=False).count() == 2
+        assert db.apply_search(query, "daging").count() == 2
+        assert db.apply_search(query, "salju", ranked=False).count() == 0
+    finally:
+        session.close()
+
+
+def test_snippets_only_for_requested_pages(db, pages):
+    snippets = db.search_snippets("daging", [pages["content"]])
+    assert list(snippets) == [pages["content"]]
+    assert db.search_snippets("daging", []) == {}
+
+
+def test_home_page_counts_all_matches(client, pages):
+    response = client.get("/", params={"q": "daging", "per_page": 1})
+    assert response.status_code == 200
+    assert "Crawled Pages (2)" in response.text
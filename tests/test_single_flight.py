@@ -0,0 +1,145 @@
+"""Coalescing of concurrent crawls of the same URL"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+class Interrupted(BaseException):
+    pass
+
+
+def _start_leader(flight, key, fn):
+    """Run fn as the flight leader on a thread, returning the thread and its outcome"""
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = flight.do(key, fn)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    # Wait until the leader holds the key
+    while not flight.stats()["in_flight"]:
+        time.sleep(0.001)
+    return thread, outcome
+
+
+def test_followers_share_the_leader_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "page"
+
+    thread, outcome = _start_leader(flight, "k", work)
+    results = []
+    followers = [
+        threading.Thread(target=lambda: results.append(flight.do("k", work))) for _ in range(3)
+    ]
+    for follower in followers:
+        follower.start()
+    while flight.stats()["joined"] < 3:
+        time.sleep(0.001)
+    release.set()
+    thread.join()
+    for follower in followers:
+        follower.join()
+
+    assert calls == [1]
+    assert outcome["result"] == "page"
+    assert results == ["page"] * 3
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_leader_error_reaches_followers():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("boom")
+
+    thread, outcome = _start_leader(flight, "k", fail)
+    future, leader = flight.begin("k")
+    assert not leader
+    release.set()
+    thread.join()
+
+    assert isinstance(outcome["error"], ValueError)
+    with pytest.raises(ValueError):
+        future.result(timeout=1)
+
+
+def test_interrupted_leader_releases_followers_and_key():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def interrupted():
+        release.wait(5)
+        raise Interrupted()
+
+    thread, outcome = _start_leader(flight, "k", interrupted)
+    future, leader = flight.begin("k")
+    assert not leader
+    release.set()
+    thread.join()
+
+    # The leader sees its own interruption, followers an ordinary error
+    assert isinstance(outcome["error"], Interrupted)
+    with pytest.raises(RuntimeError):
+        future.result(timeout=1)
+    assert flight.stats()["in_flight"] == 0
+    assert flight.do("k", lambda: "again") == "again"
+
+
+def test_cancelled_follower_does_not_affect_the_others():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def work():
+        release.wait(5)
+        return "page"
+
+    thread, outcome = _start_leader(flight, "k", work)
+
+    async def follow():
+        futures = [flight.begin("k")[0] for _ in range(2)]
+        waiting = [asyncio.ensure_future(asyncio.wrap_future(future)) for future in futures]
+        await asyncio.sleep(0)
+        # One request disconnects while the crawl is still running
+        waiting[0].cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await waiting[1], waiting[0].cancelled()
+
+    result, cancelled = asyncio.run(follow())
+    thread.join()
+
+    assert cancelled
+    assert result == "page"
+    assert outcome == {"result": "page"}
+
+
+def test_leader_reuses_a_page_stored_while_it_waited(db, monkeypatch):
+    import crawl_service
+    from datetime import datetime
+
+    checked_at = datetime.now()
+    db.save_crawled_page(
+        url="https://example.com/news", title="News", description="", content="Fresh", html="<p>x</p>"
+    )
+    monkeypatch.setattr(
+        crawl_service, "fetch_page", lambda *args, **kwargs: pytest.fail("crawled again")
+    )
+
+    page = crawl_service.crawl_and_store("https://example.com/news", since=checked_at)
+    assert page["content"] == "Fresh"
@@ -0,0 +1,115 @@
+import argparse
+import configparser
+from fnmatch import fnmatch
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Read configuration
+config = configparser.ConfigParser()
+config.read("config.ini")
+
+PREFER_HTTPS = config.getboolean("urls", "prefer_https", fallback=False)
+STRIP_TRAILING_SLASH = config.getboolean("urls", "strip_trailing_slash", fallback=True)
+# Tracking parameters dropped from the query string, shell-style patterns
+STRIP_PARAMS = [
+    param.strip().lower()
+    for param in config.get(
+        "urls",
+        "strip_params",
+        fallback="utm_*, fbclid, gclid, dclid, msclkid, mc_cid, mc_eid, _ga, ref_src",
+    ).split(",")
+    if param.strip()
+]
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return any(fnmatch(name, pattern) for pattern in STRIP_PARAMS)
+
+
+def canonicalize_url(url):
+    """Normalize a URL so that variants of the same page share one key"""
+    parts = urlsplit((url or "").strip())
+    scheme = parts.scheme.lower()
+    if scheme == "http" and PREFER_HTTPS:
+        scheme = "https"
+
+    # Lowercase host, drop the default port of the original scheme
+    host = (parts.hostname or "").rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        netloc = f"{userinfo}@{netloc}"
+
+    path = parts.path or "/"
+    if STRIP_TRAILING_SLASH and len(path) > 1:
+        path = path.rstrip("/") or "/"
+
+    query = urlencode(
+        sorted(
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not _is_tracking_param(name)
+        )
+    )
+
+    # Fragments only matter for hash-bang and client-side routes
+    fragment = parts.fragment if parts.fragment.startswith(("!", "/")) else ""
+
+    return urlunsplit((scheme, netloc, path, query, fragment))
+
+
+def _site(url):
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def resolve_canonical(url, canonical_href, holds_other_page=None):
+    """Canonical URL of a page, honouring <link rel=canonical> when it points to the same site
+
+    Canonicals pointing at the site root are ignored, as are those for which
+    holds_other_page(canonical) is true, e.g. because a different page is
+    already stored there. Following either would overwrite another page.
+    """
+    url = canonicalize_url(url)
+    if not canonical_href:
+        return url
+
+    canonical = canonicalize_url(urljoin(url, canonical_href.strip()))
+    if canonical == url:
+        return url
+    # A canonical link to another site could be used to overwrite its pages
+    parts = urlsplit(canonical)
+    if parts.scheme not in DEFAULT_PORTS or _site(canonical) != _site(url):
+        return url
+    # Templates often point every article at the home page
+    if parts.path == "/" and not parts.query:
+        return url
+    if holds_other_page is not None and holds_other_page(canonical):
+        return url
+    return canonical
+
+
+def main():
+    """Command line entry point for rewriting stored URLs into canonical form"""
+    parser = argparse.ArgumentParser(description="Maintain canonical page URLs")
+    parser.add_argument(
+        "command",
+        choices=["migrate"],
+        help="migrate: rewrite stored page URLs into canonical form, merging duplicates",
+    )
+    parser.parse_args()
+
+    from database import init_db, canonicalize_stored_urls
+
+    init_db(migrate_html=False)
+    canonicalize_stored_urls()
+
+
+if __name__ == "__main__":
+    main()